@@ -0,0 +1,149 @@
+from collections import Counter
+from types import SimpleNamespace
+import csv
+import io
+from typing import Any, Dict
+import time
+
+from k8s_discovery import K8sAssetDiscovery
+from schema import EDGE_TYPES, VERTEX_TYPES, file_tag
+from tigergraph_manager import TigerGraphManager
+
+from benchmarks.synthetic import SyntheticCluster
+
+class _RecordingApi:
+    """Base for fake API groups; counts every call by method name."""
+
+    def __init__(self, cluster: SyntheticCluster, calls: Counter, latency: float = 0.0):
+        self._cluster = cluster
+        self._calls = calls
+        self._latency = latency
+
+    def _list(self, method: str, items):
+        self._calls[method] += 1
+        if self._latency:
+            time.sleep(self._latency)
+        return SimpleNamespace(items=items)
+
+class FakeCoreV1Api(_RecordingApi):
+    def list_namespace(self):
+        return self._list("list_namespace", self._cluster.namespaces)
+
+    def list_node(self):
+        return self._list("list_node", self._cluster.nodes)
+
+    def list_pod_for_all_namespaces(self):
+        return self._list("list_pod_for_all_namespaces", self._cluster.pods)
+
+    def list_service_for_all_namespaces(self):
+        return self._list("list_service_for_all_namespaces", self._cluster.services)
+
+    def list_config_map_for_all_namespaces(self):
+        return self._list("list_config_map_for_all_namespaces", self._cluster.configmaps)
+
+    def list_secret_for_all_namespaces(self):
+        return self._list("list_secret_for_all_namespaces", self._cluster.secrets)
+
+class FakeAppsV1Api(_RecordingApi):
+    def list_deployment_for_all_namespaces(self):
+        return self._list("list_deployment_for_all_namespaces", self._cluster.deployments)
+
+class FakeRbacV1Api(_RecordingApi):
+    def list_role_for_all_namespaces(self):
+        return self._list("list_role_for_all_namespaces", self._cluster.roles)
+
+    def list_cluster_role(self):
+        return self._list("list_cluster_role", self._cluster.cluster_roles)
+
+def make_fake_discovery(cluster: SyntheticCluster, calls: Counter = None, latency: float = 0.0) -> K8sAssetDiscovery:
+    """Builds a K8sAssetDiscovery wired to fake APIs instead of a kubeconfig."""
+    calls = calls if calls is not None else Counter()
+    return K8sAssetDiscovery(
+        cluster_name=cluster.spec.name,
+        apis={
+            "v1": FakeCoreV1Api(cluster, calls, latency),
+            "apps_v1": FakeAppsV1Api(cluster, calls, latency),
+            "rbac_v1": FakeRbacV1Api(cluster, calls, latency)
+        }
+    )
+
+class RecordingTigerGraphConnection:
+    """In-memory stand-in for TigerGraphConnection that records every REST call."""
+
+    def __init__(self, latency: float = 0.0):
+        self.graphname = "K8sSecurityGraph"
+        self.latency = latency
+        self.calls = Counter()
+        self.vertices: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.edges: Dict[str, set] = {}
+
+    def _record(self, method: str):
+        self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def getVersion(self):
+        self._record("getVersion")
+        return "fake"
+
+    def upsertVertexData(self, vertexType, vertexId, attributes=None):
+        self._record("upsertVertexData")
+        self.vertices.setdefault(vertexType, {})[vertexId] = attributes or {}
+        return 1
+
+    def upsertVertices(self, vertexType, vertices):
+        self._record("upsertVertices")
+        bucket = self.vertices.setdefault(vertexType, {})
+        for vertex_id, attributes in vertices:
+            bucket[vertex_id] = attributes
+        return len(vertices)
+
+    def upsertEdgeData(self, sourceVertexType, sourceVertexId, edgeType, targetVertexType, targetVertexId, attributes=None):
+        self._record("upsertEdgeData")
+        self.edges.setdefault(edgeType, set()).add((sourceVertexId, targetVertexId))
+        return 1
+
+    def upsertEdges(self, sourceVertexType, edgeType, targetVertexType, edges):
+        self._record("upsertEdges")
+        bucket = self.edges.setdefault(edgeType, set())
+        for source_id, target_id, _ in edges:
+            bucket.add((source_id, target_id))
+        return len(edges)
+
+    def runLoadingJobWithData(self, data, fileTag, jobName, sep=None, eol=None):
+        self._record("runLoadingJobWithData")
+        rows = list(csv.reader(io.StringIO(data), delimiter=sep or ","))
+        for vertex in VERTEX_TYPES:
+            if file_tag(vertex.name) == fileTag:
+                bucket = self.vertices.setdefault(vertex.name, {})
+                for row in rows:
+                    bucket[row[0]] = dict(zip((attr.name for attr in vertex.attributes), row[1:]))
+        for edge in EDGE_TYPES:
+            if file_tag(edge.name) == fileTag:
+                self.edges.setdefault(edge.name, set()).update((row[0], row[1]) for row in rows)
+        return [{"statistics": {"validLine": len(rows)}}]
+
+    def runInterpretedQuery(self, queryText, params=None):
+        self._record("runInterpretedQuery")
+        return [{}]
+
+    def getVertexStatistics(self):
+        self._record("getVertexStatistics")
+        return {vertex_type: len(ids) for vertex_type, ids in self.vertices.items()}
+
+    def getEdgeStatistics(self):
+        self._record("getEdgeStatistics")
+        return {edge_type: len(pairs) for edge_type, pairs in self.edges.items()}
+
+def make_fake_manager(latency: float = 0.0, batch_size: int = 500, use_loading_job: bool = False) -> TigerGraphManager:
+    """Builds a TigerGraphManager backed by a RecordingTigerGraphConnection."""
+    return TigerGraphManager(
+        host="fake",
+        port=0,
+        username="tigergraph",
+        password="",
+        graph_name="K8sSecurityGraph",
+        batch_size=batch_size,
+        use_loading_job=use_loading_job,
+        conn=RecordingTigerGraphConnection(latency)
+    )
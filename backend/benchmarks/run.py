@@ -0,0 +1,149 @@
+"""End-to-end benchmark: discovery -> vertex load -> relationships -> query.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --pods 1000 10000 100000 --output results.json
+    python -m benchmarks.run --pods 1000 --baseline results.json
+"""
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List
+
+from benchmarks.fakes import make_fake_discovery, make_fake_manager
+from benchmarks.synthetic import ClusterSpec, SyntheticCluster
+from tigergraph_manager import ImportReport
+
+RESULTS_SCHEMA_VERSION = 1
+
+@contextmanager
+def _timed(phases: Dict[str, Dict[str, Any]], name: str):
+    phase = phases.setdefault(name, {})
+    start = time.perf_counter()
+    try:
+        yield phase
+    finally:
+        phase["seconds"] = time.perf_counter() - start
+        if phase.get("records") and phase["seconds"] > 0:
+            phase["records_per_second"] = phase["records"] / phase["seconds"]
+
+def run_scenario(spec: ClusterSpec, k8s_latency: float = 0.0, tg_latency: float = 0.0,
+                 batch_size: int = 500, use_loading_job: bool = False) -> Dict[str, Any]:
+    phases: Dict[str, Dict[str, Any]] = {}
+
+    with _timed(phases, "generate") as phase:
+        cluster = SyntheticCluster(spec)
+        phase["records"] = len(cluster.pods)
+
+    k8s_calls = Counter()
+    discovery = make_fake_discovery(cluster, k8s_calls, k8s_latency)
+    with _timed(phases, "discovery") as phase:
+        assets = discovery.discover_all_assets()
+        phase["records"] = sum(len(items) for items in assets.values())
+
+    manager = make_fake_manager(tg_latency, batch_size, use_loading_job)
+    report = ImportReport(cluster=spec.name)
+    with _timed(phases, "vertices") as phase:
+        manager.import_vertices(assets, report)
+        phase["records"] = sum(len(ids) for ids in manager.conn.vertices.values())
+    with _timed(phases, "relationships") as phase:
+        manager.import_relationships(assets, report)
+        phase["records"] = sum(len(pairs) for pairs in manager.conn.edges.values())
+
+    with _timed(phases, "query") as phase:
+        manager.get_graph_statistics()
+        manager.query_attack_paths(source_type="Pod", target_type="Secret")
+        manager.visual_graph_data()
+
+    return {
+        "pods": spec.pod_count,
+        "spec": spec.to_dict(),
+        "phases": phases,
+        "failed_batches": len(report.failed),
+        "k8s_calls": dict(k8s_calls),
+        "tigergraph_calls": dict(manager.conn.calls)
+    }
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Returns a description of every phase that got slower than threshold x baseline."""
+    regressions = []
+    baseline_by_pods = {scenario["pods"]: scenario for scenario in baseline.get("results", [])}
+    for scenario in results["results"]:
+        previous = baseline_by_pods.get(scenario["pods"])
+        if not previous:
+            continue
+        for name, phase in scenario["phases"].items():
+            before = previous["phases"].get(name, {}).get("seconds")
+            if before and phase["seconds"] > before * threshold:
+                regressions.append(
+                    f"{scenario['pods']} pods / {name}: {before:.3f}s -> {phase['seconds']:.3f}s "
+                    f"({phase['seconds'] / before:.2f}x)"
+                )
+    return regressions
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark discovery, vertex load, relationships and query")
+    parser.add_argument("--pods", type=int, nargs="+", default=[1000, 10000],
+                        help="Cluster sizes to run (e.g. 1000 10000 100000)")
+    parser.add_argument("--deployments-per-namespace", type=int, default=10)
+    parser.add_argument("--pods-per-deployment", type=int, default=10)
+    parser.add_argument("--secrets-per-namespace", type=int, default=5)
+    parser.add_argument("--configmaps-per-namespace", type=int, default=5)
+    parser.add_argument("--services-per-namespace", type=int, default=5)
+    parser.add_argument("--label-cardinality", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=500, help="Records per TigerGraph upsert request")
+    parser.add_argument("--loading-job", action="store_true", help="Import through CSV loading job payloads")
+    parser.add_argument("--k8s-latency", type=float, default=0.0, help="Simulated seconds per apiserver list call")
+    parser.add_argument("--tg-latency", type=float, default=0.0, help="Simulated seconds per TigerGraph REST call")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="Previous JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio that counts as a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    scenarios = []
+    for pods in args.pods:
+        spec = ClusterSpec.for_pods(
+            pods,
+            deployments_per_namespace=args.deployments_per_namespace,
+            pods_per_deployment=args.pods_per_deployment,
+            secrets_per_namespace=args.secrets_per_namespace,
+            configmaps_per_namespace=args.configmaps_per_namespace,
+            services_per_namespace=args.services_per_namespace,
+            label_cardinality=args.label_cardinality
+        )
+        result = run_scenario(spec, args.k8s_latency, args.tg_latency, args.batch_size, args.loading_job)
+        scenarios.append(result)
+        summary = ", ".join(f"{name} {phase['seconds']:.3f}s" for name, phase in result["phases"].items())
+        print(f"{result['pods']} pods: {summary}", file=sys.stderr)
+
+    results = {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": scenarios
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, List
+import random
+
+@dataclass
+class ClusterSpec:
+    """Shape of a synthetic cluster; pod count is namespaces * deployments * pods."""
+    name: str = "bench"
+    namespaces: int = 10
+    deployments_per_namespace: int = 10
+    pods_per_deployment: int = 10
+    containers_per_pod: int = 2
+    services_per_namespace: int = 5
+    configmaps_per_namespace: int = 5
+    secrets_per_namespace: int = 5
+    roles_per_namespace: int = 2
+    cluster_roles: int = 20
+    nodes: int = 50
+    label_cardinality: int = 10
+    seed: int = 42
+
+    @property
+    def pod_count(self) -> int:
+        return self.namespaces * self.deployments_per_namespace * self.pods_per_deployment
+
+    @classmethod
+    def for_pods(cls, pods: int, **overrides) -> "ClusterSpec":
+        """Scales namespaces (and nodes) so the cluster has roughly `pods` pods."""
+        spec = cls(**overrides)
+        per_namespace = spec.deployments_per_namespace * spec.pods_per_deployment
+        spec.namespaces = max(1, pods // per_namespace)
+        if "nodes" not in overrides:
+            spec.nodes = max(1, spec.pod_count // 30)
+        return spec
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["pod_count"] = self.pod_count
+        return data
+
+class _Rule:
+    def __init__(self, verbs: List[str], resources: List[str]):
+        self.verbs = verbs
+        self.resources = resources
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"api_groups": [""], "resources": self.resources, "verbs": self.verbs}
+
+def _metadata(name: str, uid: str, created: datetime, namespace: str = None, labels: Dict[str, str] = None):
+    return SimpleNamespace(
+        name=name,
+        uid=uid,
+        namespace=namespace,
+        labels=labels,
+        creation_timestamp=created
+    )
+
+class SyntheticCluster:
+    """Kubernetes API objects for a ClusterSpec, shaped like kubernetes client models."""
+
+    def __init__(self, spec: ClusterSpec):
+        self.spec = spec
+        rng = random.Random(spec.seed)
+        created = datetime(2024, 1, 1)
+        label_values = [f"v{i}" for i in range(max(1, spec.label_cardinality))]
+
+        def uid(kind: str, *parts) -> str:
+            return "-".join([spec.name, kind, *map(str, parts)])
+
+        def labels() -> Dict[str, str]:
+            return {"app": rng.choice(label_values), "tier": rng.choice(label_values)}
+
+        self.nodes = [SimpleNamespace(
+            metadata=_metadata(f"node-{i}", uid("node", i), created, labels=labels()),
+            status=SimpleNamespace(conditions=[SimpleNamespace(type="Ready")])
+        ) for i in range(spec.nodes)]
+
+        self.namespaces, self.pods, self.services = [], [], []
+        self.deployments, self.configmaps, self.secrets, self.roles = [], [], [], []
+        for n in range(spec.namespaces):
+            ns = f"ns-{n}"
+            self.namespaces.append(SimpleNamespace(
+                metadata=_metadata(ns, uid("ns", n), created),
+                status=SimpleNamespace(phase="Active")
+            ))
+            for d in range(spec.deployments_per_namespace):
+                deploy = f"deploy-{d}"
+                self.deployments.append(SimpleNamespace(
+                    metadata=_metadata(deploy, uid("deploy", n, d), created, ns),
+                    spec=SimpleNamespace(replicas=spec.pods_per_deployment)
+                ))
+                for p in range(spec.pods_per_deployment):
+                    containers = [SimpleNamespace(
+                        name=f"c{c}",
+                        image=f"registry.local/{deploy}:{c}",
+                        ports=[SimpleNamespace(container_port=8080 + c)]
+                    ) for c in range(spec.containers_per_pod)]
+                    self.pods.append(SimpleNamespace(
+                        metadata=_metadata(f"{deploy}-{p}", uid("pod", n, d, p), created + timedelta(seconds=p), ns, labels()),
+                        spec=SimpleNamespace(containers=containers, node_name=f"node-{rng.randrange(max(1, spec.nodes))}"),
+                        status=SimpleNamespace(phase="Running")
+                    ))
+            for s in range(spec.services_per_namespace):
+                self.services.append(SimpleNamespace(
+                    metadata=_metadata(f"svc-{s}", uid("svc", n, s), created, ns),
+                    spec=SimpleNamespace(type="ClusterIP", cluster_ip=f"10.{n % 256}.{s % 256}.1", selector=labels())
+                ))
+            for c in range(spec.configmaps_per_namespace):
+                self.configmaps.append(SimpleNamespace(metadata=_metadata(f"cm-{c}", uid("cm", n, c), created, ns)))
+            for s in range(spec.secrets_per_namespace):
+                self.secrets.append(SimpleNamespace(
+                    metadata=_metadata(f"secret-{s}", uid("secret", n, s), created, ns),
+                    type="Opaque"
+                ))
+            for r in range(spec.roles_per_namespace):
+                self.roles.append(SimpleNamespace(
+                    metadata=_metadata(f"role-{r}", uid("role", n, r), created, ns),
+                    rules=[_Rule(["get", "list"], ["pods", "secrets"])]
+                ))
+
+        self.cluster_roles = [SimpleNamespace(
+            metadata=_metadata(f"clusterrole-{i}", uid("clusterrole", i), created),
+            rules=[_Rule(["*"], ["*"])]
+        ) for i in range(spec.cluster_roles)]
@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,10 +8,44 @@ class Settings(BaseSettings):
     tigergraph_username: str = "tigergraph"
     tigergraph_password: str = "tigergraph"
     tigergraph_graph_name: str = "K8sSecurityGraph"
+    # Create/migrate the schema and install the loading job at startup
+    tigergraph_bootstrap_schema: bool = False
+    # Import through the generated loading job (CSV) instead of JSON upserts
+    tigergraph_use_loading_job: bool = False
     
     # K8s Configuration
     k8s_config_file: str | None = None
     k8s_in_cluster: bool = False
+    # Kubeconfig contexts to discover; empty means the current context only
+    k8s_contexts: List[str] = []
+    # Name used for the in-cluster / current-context cluster in vertex ids
+    k8s_cluster_name: Optional[str] = None
+    k8s_discovery_workers: int = 4
+    
+    # Snapshot Configuration
+    # When set, discovery replays this snapshot instead of querying the apiserver
+    k8s_snapshot_file: Optional[str] = None
+    snapshot_dir: str = "snapshots"
+    
+    # Profiling Configuration
+    # Requests with an "X-Profile: 1" header are run under cProfile when enabled
+    profiling_enabled: bool = False
+    profile_dir: str = "profiles"
+    
+    # Resilience Configuration (rate limits in requests/second, 0 = unlimited)
+    tigergraph_batch_size: int = 500
+    tigergraph_rate_limit: float = 0.0
+    tigergraph_rate_burst: int = 10
+    tigergraph_max_retries: int = 3
+    tigergraph_breaker_threshold: int = 5
+    tigergraph_breaker_reset_seconds: float = 30.0
+    k8s_rate_limit: float = 5.0
+    k8s_rate_burst: int = 10
+    k8s_max_retries: int = 3
+    k8s_breaker_threshold: int = 5
+    k8s_breaker_reset_seconds: float = 30.0
+    retry_backoff_base: float = 0.5
+    retry_backoff_max: float = 10.0
     
     # API Configuration
     api_host: str = "0.0.0.0"
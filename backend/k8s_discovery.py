@@ -1,51 +1,113 @@
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 import logging
 from datetime import datetime
 
+from metrics import K8S_API_SECONDS, profile_worker
+from resilience import ResiliencePolicy
+
 logger = logging.getLogger(__name__)
 
+IN_CLUSTER_NAME = "in-cluster"
+
+def is_transient_api_error(exc: Exception) -> bool:
+    # Throttling and server-side errors are worth retrying, 4xx answers are not;
+    # anything that is not an ApiException is a connection-level failure
+    if isinstance(exc, ApiException):
+        return exc.status in (None, 0, 429) or exc.status >= 500
+    return True
+
+def is_api_rejection(exc: Exception) -> bool:
+    # The apiserver answered and refused the request (forbidden, not found, ...)
+    return isinstance(exc, ApiException) and exc.status is not None and 400 <= exc.status < 500 and exc.status != 429
+
 class K8sAssetDiscovery:
-    def __init__(self, config_file: str = None, in_cluster: bool = False):
+    def __init__(self, config_file: str = None, in_cluster: bool = False,
+                 context: str = None, cluster_name: str = None, resilience: ResiliencePolicy = None,
+                 apis: Dict[str, Any] = None):
+        """`apis` supplies pre-built API group clients keyed "v1", "apps_v1",
+        "rbac_v1" and "networking_v1" (benchmarks pass fakes); no kubeconfig is
+        loaded then."""
         try:
-            if in_cluster:
-                config.load_incluster_config()
-            elif config_file:
-                config.load_kube_config(config_file=config_file)
+            if apis is not None:
+                self.cluster_name = cluster_name or IN_CLUSTER_NAME
             else:
-                config.load_kube_config()
+                # Each instance gets its own ApiClient so several kubeconfig
+                # contexts can be discovered side by side in one process
+                if in_cluster:
+                    config.load_incluster_config()
+                    api_client = client.ApiClient()
+                    self.cluster_name = cluster_name or IN_CLUSTER_NAME
+                else:
+                    api_client = config.new_client_from_config(config_file=config_file, context=context)
+                    if not context:
+                        _, active_context = config.list_kube_config_contexts(config_file=config_file)
+                        context = active_context['name']
+                    self.cluster_name = cluster_name or context
+                apis = {
+                    "v1": client.CoreV1Api(api_client),
+                    "apps_v1": client.AppsV1Api(api_client),
+                    "rbac_v1": client.RbacAuthorizationV1Api(api_client),
+                    "networking_v1": client.NetworkingV1Api(api_client)
+                }
             
-            self.v1 = client.CoreV1Api()
-            self.apps_v1 = client.AppsV1Api()
-            self.rbac_v1 = client.RbacAuthorizationV1Api()
-            self.networking_v1 = client.NetworkingV1Api()
-            logger.info("Kubernetes client initialized successfully")
+            self.v1 = apis["v1"]
+            self.apps_v1 = apis["apps_v1"]
+            self.rbac_v1 = apis["rbac_v1"]
+            self.networking_v1 = apis.get("networking_v1")
+            # Each apiserver gets its own rate limit and circuit breaker
+            template = resilience or ResiliencePolicy("k8s")
+            self.resilience = template.derive(
+                f"k8s:{self.cluster_name}", is_transient=is_transient_api_error, is_rejection=is_api_rejection
+            )
+            logger.info(f"Kubernetes client initialized successfully for cluster {self.cluster_name}")
         except Exception as e:
             logger.error(f"Failed to initialize Kubernetes client: {e}")
             raise
 
+    # The discover_* methods return [] when the apiserver rejects a list call
+    # (e.g. 403 on secrets). Errors still failing after retries propagate, so a
+    # cluster whose discovery broke is skipped rather than imported as empty.
+
+    def _list(self, call: str, api, *args, **kwargs):
+        def attempt():
+            with K8S_API_SECONDS.labels(self.cluster_name, call).time():
+                return getattr(api, call)(*args, **kwargs)
+
+        return self.resilience.call(attempt)
+
+    def _qualify(self, local_id: str) -> str:
+        # Node names, namespace names and container ids are only unique
+        # within a cluster, so every vertex id carries the cluster name
+        return f"{self.cluster_name}/{local_id}"
+
     def discover_namespaces(self) -> List[Dict[str, Any]]:
         try:
-            namespaces = self.v1.list_namespace()
+            namespaces = self._list("list_namespace", self.v1)
             return [{
-                "id": ns.metadata.name,
+                "id": self._qualify(ns.metadata.name),
+                "cluster": self.cluster_name,
                 "name": ns.metadata.name,
                 "status": ns.status.phase,
                 "creation_time": ns.metadata.creation_timestamp.isoformat() if ns.metadata.creation_timestamp else None
             } for ns in namespaces.items]
         except ApiException as e:
+            if not is_api_rejection(e):
+                raise
             logger.error(f"Error fetching namespaces: {e}")
             return []
 
     def discover_nodes(self) -> List[Dict[str, Any]]:
         try:
-            nodes = self.v1.list_node()
+            nodes = self._list("list_node", self.v1)
             node_list = []
             for node in nodes.items:
                 labels = dict(node.metadata.labels) if node.metadata.labels else {}
                 node_list.append({
-                    "id": node.metadata.name,
+                    "id": self._qualify(node.metadata.name),
+                    "cluster": self.cluster_name,
                     "name": node.metadata.name,
                     "labels": str(labels),
                     "status": node.status.conditions[-1].type if node.status.conditions else "Unknown",
@@ -53,12 +115,14 @@ class K8sAssetDiscovery:
                 })
             return node_list
         except ApiException as e:
+            if not is_api_rejection(e):
+                raise
             logger.error(f"Error fetching nodes: {e}")
             return []
 
     def discover_pods(self) -> List[Dict[str, Any]]:
         try:
-            pods = self.v1.list_pod_for_all_namespaces()
+            pods = self._list("list_pod_for_all_namespaces", self.v1)
             pod_list = []
             for pod in pods.items:
                 containers = []
@@ -66,89 +130,109 @@ class K8sAssetDiscovery:
                     for container in pod.spec.containers:
                         ports = [str(port.container_port) for port in (container.ports or [])]
                         containers.append({
-                            "id": f"{pod.metadata.name}-{container.name}",
+                            "id": self._qualify(f"{pod.metadata.namespace}/{pod.metadata.name}-{container.name}"),
+                            "cluster": self.cluster_name,
                             "name": container.name,
                             "image": container.image,
                             "ports": ",".join(ports) if ports else ""
                         })
                 
                 pod_list.append({
-                    "id": pod.metadata.uid,
+                    "id": self._qualify(pod.metadata.uid),
+                    "cluster": self.cluster_name,
                     "name": pod.metadata.name,
                     "namespace": pod.metadata.namespace,
                     "status": pod.status.phase,
                     "node": pod.spec.node_name,
                     "creation_time": pod.metadata.creation_timestamp.isoformat() if pod.metadata.creation_timestamp else None,
+                    # Matched against service selectors when building relationships
+                    "labels": dict(pod.metadata.labels) if pod.metadata.labels else {},
                     "containers": containers
                 })
             return pod_list
         except ApiException as e:
+            if not is_api_rejection(e):
+                raise
             logger.error(f"Error fetching pods: {e}")
             return []
 
     def discover_services(self) -> List[Dict[str, Any]]:
         try:
-            services = self.v1.list_service_for_all_namespaces()
+            services = self._list("list_service_for_all_namespaces", self.v1)
             return [{
-                "id": svc.metadata.uid,
+                "id": self._qualify(svc.metadata.uid),
+                "cluster": self.cluster_name,
                 "name": svc.metadata.name,
                 "namespace": svc.metadata.namespace,
                 "type": svc.spec.type,
                 "cluster_ip": svc.spec.cluster_ip,
+                "selector": dict(svc.spec.selector) if svc.spec.selector else {},
                 "creation_time": svc.metadata.creation_timestamp.isoformat() if svc.metadata.creation_timestamp else None
             } for svc in services.items]
         except ApiException as e:
+            if not is_api_rejection(e):
+                raise
             logger.error(f"Error fetching services: {e}")
             return []
 
     def discover_deployments(self) -> List[Dict[str, Any]]:
         try:
-            deployments = self.apps_v1.list_deployment_for_all_namespaces()
+            deployments = self._list("list_deployment_for_all_namespaces", self.apps_v1)
             return [{
-                "id": deploy.metadata.uid,
+                "id": self._qualify(deploy.metadata.uid),
+                "cluster": self.cluster_name,
                 "name": deploy.metadata.name,
                 "namespace": deploy.metadata.namespace,
                 "replicas": deploy.spec.replicas,
                 "creation_time": deploy.metadata.creation_timestamp.isoformat() if deploy.metadata.creation_timestamp else None
             } for deploy in deployments.items]
         except ApiException as e:
+            if not is_api_rejection(e):
+                raise
             logger.error(f"Error fetching deployments: {e}")
             return []
 
     def discover_configmaps(self) -> List[Dict[str, Any]]:
         try:
-            configmaps = self.v1.list_config_map_for_all_namespaces()
+            configmaps = self._list("list_config_map_for_all_namespaces", self.v1)
             return [{
-                "id": cm.metadata.uid,
+                "id": self._qualify(cm.metadata.uid),
+                "cluster": self.cluster_name,
                 "name": cm.metadata.name,
                 "namespace": cm.metadata.namespace,
                 "creation_time": cm.metadata.creation_timestamp.isoformat() if cm.metadata.creation_timestamp else None
             } for cm in configmaps.items]
         except ApiException as e:
+            if not is_api_rejection(e):
+                raise
             logger.error(f"Error fetching configmaps: {e}")
             return []
 
     def discover_secrets(self) -> List[Dict[str, Any]]:
         try:
-            secrets = self.v1.list_secret_for_all_namespaces()
+            secrets = self._list("list_secret_for_all_namespaces", self.v1)
             return [{
-                "id": sec.metadata.uid,
+                "id": self._qualify(sec.metadata.uid),
+                "cluster": self.cluster_name,
                 "name": sec.metadata.name,
                 "namespace": sec.metadata.namespace,
                 "type": sec.type,
                 "creation_time": sec.metadata.creation_timestamp.isoformat() if sec.metadata.creation_timestamp else None
             } for sec in secrets.items]
         except ApiException as e:
+            if not is_api_rejection(e):
+                raise
             logger.error(f"Error fetching secrets: {e}")
             return []
 
     def discover_rbac(self) -> List[Dict[str, Any]]:
         rbac_list = []
         try:
-            roles = self.rbac_v1.list_role_for_all_namespaces()
+            roles = self._list("list_role_for_all_namespaces", self.rbac_v1)
             for role in roles.items:
                 rbac_list.append({
-                    "id": role.metadata.uid,
+                    "id": self._qualify(role.metadata.uid),
+                    "cluster": self.cluster_name,
                     "name": role.metadata.name,
                     "namespace": role.metadata.namespace,
                     "type": "Role",
@@ -156,13 +240,16 @@ class K8sAssetDiscovery:
                     "creation_time": role.metadata.creation_timestamp.isoformat() if role.metadata.creation_timestamp else None
                 })
         except ApiException as e:
+            if not is_api_rejection(e):
+                raise
             logger.error(f"Error fetching roles: {e}")
         
         try:
-            cluster_roles = self.rbac_v1.list_cluster_role()
+            cluster_roles = self._list("list_cluster_role", self.rbac_v1)
             for cr in cluster_roles.items:
                 rbac_list.append({
-                    "id": cr.metadata.uid,
+                    "id": self._qualify(cr.metadata.uid),
+                    "cluster": self.cluster_name,
                     "name": cr.metadata.name,
                     "namespace": "cluster",
                     "type": "ClusterRole",
@@ -170,6 +257,8 @@ class K8sAssetDiscovery:
                     "creation_time": cr.metadata.creation_timestamp.isoformat() if cr.metadata.creation_timestamp else None
                 })
         except ApiException as e:
+            if not is_api_rejection(e):
+                raise
             logger.error(f"Error fetching cluster roles: {e}")
         
         return rbac_list
@@ -184,4 +273,71 @@ class K8sAssetDiscovery:
             "configmaps": self.discover_configmaps(),
             "secrets": self.discover_secrets(),
             "rbac": self.discover_rbac()
-        }
\ No newline at end of file
+        }
+
+class MultiClusterDiscovery:
+    """Discovers assets from several kubeconfig contexts over a worker pool."""
+
+    def __init__(self, config_file: str = None, in_cluster: bool = False,
+                 contexts: List[str] = None, cluster_name: str = None, max_workers: int = 4,
+                 resilience: ResiliencePolicy = None):
+        self.max_workers = max_workers
+        self.clusters: Dict[str, K8sAssetDiscovery] = {}
+        
+        if in_cluster or not contexts:
+            discovery = K8sAssetDiscovery(
+                config_file=config_file,
+                in_cluster=in_cluster,
+                cluster_name=cluster_name,
+                resilience=resilience
+            )
+            self.clusters[discovery.cluster_name] = discovery
+            return
+        
+        for context in contexts:
+            try:
+                discovery = K8sAssetDiscovery(config_file=config_file, context=context, resilience=resilience)
+                self.clusters[discovery.cluster_name] = discovery
+            except Exception as e:
+                logger.error(f"Skipping cluster {context}: {e}")
+        
+        if not self.clusters:
+            raise RuntimeError("No Kubernetes cluster could be initialized")
+
+    def cluster_names(self) -> List[str]:
+        return list(self.clusters.keys())
+
+    def get(self, cluster: str) -> K8sAssetDiscovery:
+        if cluster not in self.clusters:
+            raise KeyError(f"Unknown cluster: {cluster}")
+        return self.clusters[cluster]
+
+    def discover_all_assets(self, clusters: Optional[List[str]] = None,
+                            errors: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Returns discovered assets keyed by cluster name.
+
+        Clusters whose discovery failed are left out; their error is added to
+        `errors` when given.
+        """
+        targets = [self.get(name) for name in (clusters or self.cluster_names())]
+        results = {}
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(targets)))) as pool:
+            futures = {d.cluster_name: pool.submit(profile_worker(d.discover_all_assets)) for d in targets}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f"Error discovering cluster {name}: {e}")
+                    if errors is not None:
+                        errors[name] = str(e)
+        
+        return results
+
+    @staticmethod
+    def merge_assets(cluster_assets: Dict[str, Dict[str, List[Dict[str, Any]]]]) -> Dict[str, List[Dict[str, Any]]]:
+        merged: Dict[str, List[Dict[str, Any]]] = {}
+        for assets in cluster_assets.values():
+            for asset_type, items in assets.items():
+                merged.setdefault(asset_type, []).extend(items)
+        return merged
@@ -1,14 +1,22 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from contextlib import asynccontextmanager
 import logging
+import os
+import time
+import uuid
 from datetime import datetime
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 from config import settings
-from k8s_discovery import K8sAssetDiscovery
-from tigergraph_manager import TigerGraphManager
+from k8s_discovery import MultiClusterDiscovery
+from tigergraph_manager import ImportReport, TigerGraphManager
+from snapshot import SnapshotDiscovery, write_snapshot, import_snapshot
+from metrics import HTTP_REQUEST_SECONDS, PROFILE_HEADER, import_phase, profiled
+from resilience import policy_from_settings
+from schema import SchemaManager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,6 +24,8 @@ logger = logging.getLogger(__name__)
 # Global variables
 k8s_discovery = None
 tg_manager = None
+# Most recent ImportReport per cluster, kept so failed batches can be replayed
+import_reports = {}
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -23,11 +33,21 @@ async def lifespan(app: FastAPI):
     
     # Startup
     try:
-        k8s_discovery = K8sAssetDiscovery(
-            config_file=settings.k8s_config_file,
-            in_cluster=settings.k8s_in_cluster
-        )
-        logger.info("K8s discovery initialized")
+        if settings.k8s_snapshot_file:
+            k8s_discovery = SnapshotDiscovery(
+                settings.k8s_snapshot_file,
+                max_workers=settings.k8s_discovery_workers
+            )
+        else:
+            k8s_discovery = MultiClusterDiscovery(
+                config_file=settings.k8s_config_file,
+                in_cluster=settings.k8s_in_cluster,
+                contexts=settings.k8s_contexts,
+                cluster_name=settings.k8s_cluster_name,
+                max_workers=settings.k8s_discovery_workers,
+                resilience=policy_from_settings(settings, "k8s")
+            )
+        logger.info(f"K8s discovery initialized for clusters: {k8s_discovery.cluster_names()}")
     except Exception as e:
         logger.error(f"Failed to initialize K8s discovery: {e}")
     
@@ -37,12 +57,24 @@ async def lifespan(app: FastAPI):
             port=settings.tigergraph_port,
             username=settings.tigergraph_username,
             password=settings.tigergraph_password,
-            graph_name=settings.tigergraph_graph_name
+            graph_name=settings.tigergraph_graph_name,
+            batch_size=settings.tigergraph_batch_size,
+            resilience=policy_from_settings(settings, "tigergraph"),
+            use_loading_job=settings.tigergraph_use_loading_job
         )
         logger.info("TigerGraph manager initialized")
     except Exception as e:
         logger.error(f"Failed to initialize TigerGraph manager: {e}")
     
+    if tg_manager and settings.tigergraph_bootstrap_schema:
+        try:
+            schema_manager = SchemaManager(tg_manager)
+            schema_manager.ensure_schema()
+            schema_manager.install_loading_job()
+            logger.info("TigerGraph schema and loading job are up to date")
+        except Exception as e:
+            logger.error(f"Failed to bootstrap TigerGraph schema: {e}")
+    
     yield
     
     # Shutdown
@@ -63,9 +95,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template so path parameters don't explode cardinality
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        HTTP_REQUEST_SECONDS.labels(request.method, path, str(status)).observe(time.perf_counter() - start)
+
+def _profiling_requested(header_value: Optional[str]) -> bool:
+    return settings.profiling_enabled and header_value is not None and header_value.lower() in ("1", "true", "yes")
+
 class DiscoveryResponse(BaseModel):
     status: str
     timestamp: datetime
+    clusters: List[str] = []
     assets: Dict[str, List[Dict[str, Any]]]
 
 class ImportResponse(BaseModel):
@@ -73,6 +123,13 @@ class ImportResponse(BaseModel):
     message: str
     timestamp: datetime
 
+class SnapshotResponse(BaseModel):
+    status: str
+    name: str
+    clusters: List[str]
+    records: int
+    timestamp: datetime
+
 class QueryRequest(BaseModel):
     source_type: Optional[str] = None
     target_type: Optional[str] = None
@@ -87,19 +144,32 @@ class QueryResponse(BaseModel):
 async def root():
     return {"message": "K8s Native Security Platform API"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+# Endpoints and background tasks that reach the apiserver or TigerGraph are
+# plain functions: FastAPI runs them in its threadpool, so rate limiting and
+# retry backoff sleeps never block the event loop.
 @app.get("/health")
-async def health_check():
+def health_check():
     status = {"status": "healthy", "timestamp": datetime.now()}
     
-    # Check K8s connection
-    try:
-        if k8s_discovery:
-            nodes = k8s_discovery.discover_nodes()
-            status["k8s"] = "connected" if nodes else "no_data"
-        else:
-            status["k8s"] = "not_initialized"
-    except Exception as e:
-        status["k8s"] = f"error: {str(e)}"
+    # Check K8s connection for every cluster
+    if k8s_discovery:
+        clusters = {}
+        for name, discovery in k8s_discovery.clusters.items():
+            try:
+                nodes = discovery.discover_nodes()
+                clusters[name] = "connected" if nodes else "no_data"
+            except Exception as e:
+                clusters[name] = f"error: {str(e)}"
+        status["clusters"] = clusters
+        errors = [state for state in clusters.values() if state != "connected"]
+        status["k8s"] = errors[0] if errors else "connected"
+    else:
+        status["k8s"] = "not_initialized"
     
     # Check TigerGraph connection
     try:
@@ -113,41 +183,73 @@ async def health_check():
     
     return status
 
+@app.get("/api/clusters")
+async def list_clusters():
+    """List configured K8s clusters"""
+    if not k8s_discovery:
+        raise HTTPException(status_code=500, detail="K8s discovery not initialized")
+    return {"clusters": k8s_discovery.cluster_names()}
+
+def _resolve_clusters(cluster: Optional[str]) -> Optional[List[str]]:
+    if cluster is None:
+        return None
+    if cluster not in k8s_discovery.clusters:
+        raise HTTPException(status_code=404, detail=f"Unknown cluster: {cluster}")
+    return [cluster]
+
 @app.post("/api/discover", response_model=DiscoveryResponse)
-async def discover_assets():
-    """Discover K8s cluster assets"""
+def discover_assets(cluster: Optional[str] = None):
+    """Discover K8s cluster assets, from all clusters unless one is given"""
     if not k8s_discovery:
         raise HTTPException(status_code=500, detail="K8s discovery not initialized")
     
+    clusters = _resolve_clusters(cluster)
     try:
-        assets = k8s_discovery.discover_all_assets()
+        cluster_assets = k8s_discovery.discover_all_assets(clusters)
         return DiscoveryResponse(
             status="success",
             timestamp=datetime.now(),
-            assets=assets
+            clusters=list(cluster_assets.keys()),
+            assets=MultiClusterDiscovery.merge_assets(cluster_assets)
         )
     except Exception as e:
         logger.error(f"Error during asset discovery: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/import", response_model=ImportResponse)
-async def import_to_tigergraph(background_tasks: BackgroundTasks):
-    """Import discovered assets to TigerGraph"""
+async def import_to_tigergraph(background_tasks: BackgroundTasks, cluster: Optional[str] = None,
+                               profile: Optional[str] = Header(None, alias=PROFILE_HEADER)):
+    """Import discovered assets to TigerGraph, one cluster at a time"""
     if not k8s_discovery or not tg_manager:
         raise HTTPException(status_code=500, detail="Services not initialized")
     
-    async def import_task():
+    clusters = _resolve_clusters(cluster)
+    profile_enabled = _profiling_requested(profile)
+    
+    def import_task():
         try:
-            # Discover assets
-            assets = k8s_discovery.discover_all_assets()
-            
-            # Clear existing data
-            tg_manager.clear_graph()
-            
-            # Import to TigerGraph
-            tg_manager.import_k8s_assets(assets)
+            with profiled("import", profile_enabled, settings.profile_dir):
+                # Discover assets in parallel across clusters
+                discovery_errors = {}
+                with import_phase("discovery") as phase:
+                    cluster_assets = k8s_discovery.discover_all_assets(clusters, errors=discovery_errors)
+                    phase["records"] = sum(len(items) for assets in cluster_assets.values() for items in assets.values())
+                
+                # A cluster whose discovery failed keeps its existing data
+                for name, error in discovery_errors.items():
+                    report = ImportReport(cluster=name, error=f"Discovery failed: {error}")
+                    report.finished = datetime.now()
+                    import_reports[name] = report
+                
+                for name, assets in cluster_assets.items():
+                    # Only replace the data of the cluster being refreshed
+                    import_reports[name] = tg_manager.refresh_cluster(assets, cluster=name)
             
-            logger.info("Assets imported successfully to TigerGraph")
+            incomplete = [name for name in list(cluster_assets) + list(discovery_errors) if not import_reports[name].complete]
+            if incomplete:
+                logger.error(f"Import incomplete for clusters: {incomplete}, see /api/import/status")
+            else:
+                logger.info(f"Assets imported successfully to TigerGraph for clusters: {list(cluster_assets.keys())}")
         except Exception as e:
             logger.error(f"Error during import: {e}")
     
@@ -159,18 +261,146 @@ async def import_to_tigergraph(background_tasks: BackgroundTasks):
         timestamp=datetime.now()
     )
 
+def _snapshot_path(name: str) -> str:
+    # Snapshots are addressed by file name only, never by arbitrary path
+    if not name or os.path.basename(name) != name:
+        raise HTTPException(status_code=400, detail=f"Invalid snapshot name: {name}")
+    return os.path.join(settings.snapshot_dir, name)
+
+@app.post("/api/snapshot", response_model=SnapshotResponse)
+def record_snapshot(cluster: Optional[str] = None):
+    """Discover assets and record them to a snapshot file"""
+    if not k8s_discovery:
+        raise HTTPException(status_code=500, detail="K8s discovery not initialized")
+    
+    clusters = _resolve_clusters(cluster)
+    try:
+        cluster_assets = k8s_discovery.discover_all_assets(clusters)
+        # The random suffix keeps recordings taken within the same second apart
+        name = f"snapshot-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.ndjson.gz"
+        os.makedirs(settings.snapshot_dir, exist_ok=True)
+        records = write_snapshot(_snapshot_path(name), cluster_assets)
+        return SnapshotResponse(
+            status="success",
+            name=name,
+            clusters=list(cluster_assets.keys()),
+            records=records,
+            timestamp=datetime.now()
+        )
+    except Exception as e:
+        logger.error(f"Error recording snapshot: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/snapshots")
+async def list_snapshots():
+    """List recorded snapshot files"""
+    if not os.path.isdir(settings.snapshot_dir):
+        return {"snapshots": []}
+    return {"snapshots": sorted(os.listdir(settings.snapshot_dir))}
+
+@app.post("/api/import/snapshot", response_model=ImportResponse)
+async def import_snapshot_to_tigergraph(name: str, background_tasks: BackgroundTasks, cluster: Optional[str] = None,
+                                        profile: Optional[str] = Header(None, alias=PROFILE_HEADER)):
+    """Import a recorded snapshot to TigerGraph without contacting the apiserver"""
+    if not tg_manager:
+        raise HTTPException(status_code=500, detail="TigerGraph manager not initialized")
+    
+    path = _snapshot_path(name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Snapshot not found: {name}")
+    
+    profile_enabled = _profiling_requested(profile)
+    
+    def import_task():
+        try:
+            with profiled("import-snapshot", profile_enabled, settings.profile_dir):
+                reports = import_snapshot(tg_manager, path, clusters=[cluster] if cluster else None)
+            import_reports.update(reports)
+            incomplete = [cluster_name for cluster_name, report in reports.items() if not report.complete]
+            if incomplete:
+                logger.error(f"Snapshot {name} import incomplete for clusters: {incomplete}, see /api/import/status")
+            else:
+                logger.info(f"Snapshot {name} imported to TigerGraph for clusters: {list(reports.keys())}")
+        except Exception as e:
+            logger.error(f"Error during snapshot import: {e}")
+    
+    background_tasks.add_task(import_task)
+    
+    return ImportResponse(
+        status="accepted",
+        message=f"Snapshot import of {name} started in background",
+        timestamp=datetime.now()
+    )
+
+@app.post("/api/schema", response_model=QueryResponse)
+def bootstrap_schema():
+    """Create or migrate the graph schema and reinstall the loading job"""
+    if not tg_manager:
+        raise HTTPException(status_code=500, detail="TigerGraph manager not initialized")
+    
+    try:
+        schema_manager = SchemaManager(tg_manager)
+        statements = schema_manager.ensure_schema()
+        loading_job = schema_manager.install_loading_job()
+        return QueryResponse(
+            status="success",
+            data={"schema_changes": statements, "loading_job": loading_job}
+        )
+    except Exception as e:
+        logger.error(f"Error bootstrapping schema: {e}")
+        return QueryResponse(
+            status="error",
+            error=str(e)
+        )
+
+@app.get("/api/import/status")
+async def get_import_status():
+    """Batch accounting of the most recent import of each cluster"""
+    return {"imports": {name: report.to_dict() for name, report in import_reports.items()}}
+
+@app.post("/api/import/replay", response_model=ImportResponse)
+async def replay_failed_batches(background_tasks: BackgroundTasks, cluster: Optional[str] = None):
+    """Re-send only the batches that failed in the most recent import"""
+    if not tg_manager:
+        raise HTTPException(status_code=500, detail="TigerGraph manager not initialized")
+    
+    if cluster is not None and cluster not in import_reports:
+        raise HTTPException(status_code=404, detail=f"No import recorded for cluster: {cluster}")
+    names = [cluster] if cluster else [name for name, report in import_reports.items() if not report.complete]
+    
+    def replay_task():
+        for name in names:
+            report = import_reports[name]
+            replay = tg_manager.replay_failed(report)
+            # Batches that failed again stay queued for the next replay
+            report.failed = replay.failed
+            report.batches_succeeded += replay.batches_succeeded
+            report.records_succeeded += replay.records_succeeded
+    
+    background_tasks.add_task(replay_task)
+    
+    return ImportResponse(
+        status="accepted",
+        message=f"Replay of failed batches started for clusters: {names}",
+        timestamp=datetime.now()
+    )
+
 @app.post("/api/query/attack-paths", response_model=QueryResponse)
-async def query_attack_paths(request: QueryRequest):
+def query_attack_paths(request: QueryRequest, response: Response,
+                       profile: Optional[str] = Header(None, alias=PROFILE_HEADER)):
     """Query potential attack paths in the graph"""
     if not tg_manager:
         raise HTTPException(status_code=500, detail="TigerGraph manager not initialized")
     
     try:
-        result = tg_manager.query_attack_paths(
-            source_type=request.source_type,
-            target_type=request.target_type,
-            max_depth=request.max_depth
-        )
+        with profiled("query-attack-paths", _profiling_requested(profile), settings.profile_dir) as profile_path:
+            result = tg_manager.query_attack_paths(
+                source_type=request.source_type,
+                target_type=request.target_type,
+                max_depth=request.max_depth
+            )
+        if profile_path:
+            response.headers["X-Profile-File"] = profile_path
         
         return QueryResponse(
             status="success",
@@ -184,7 +414,7 @@ async def query_attack_paths(request: QueryRequest):
         )
 
 @app.get("/api/visualize/graph", response_model=QueryResponse)
-async def get_graph_visualization():
+def get_graph_visualization():
     """Get graph data for visualization"""
     if not tg_manager:
         raise HTTPException(status_code=500, detail="TigerGraph manager not initialized")
@@ -203,7 +433,7 @@ async def get_graph_visualization():
         )
 
 @app.get("/api/statistics", response_model=QueryResponse)
-async def get_statistics():
+def get_statistics():
     """Get graph statistics"""
     if not tg_manager:
         raise HTTPException(status_code=500, detail="TigerGraph manager not initialized")
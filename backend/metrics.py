@@ -0,0 +1,165 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+import cProfile
+import functools
+import logging
+import os
+import pstats
+import sys
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+
+K8S_API_SECONDS = Histogram(
+    "k8s_api_request_seconds",
+    "Duration of Kubernetes apiserver list calls",
+    ["cluster", "call"]
+)
+
+TIGERGRAPH_REQUEST_SECONDS = Histogram(
+    "tigergraph_request_seconds",
+    "Duration of TigerGraph REST calls by operation",
+    ["operation"]
+)
+
+TIGERGRAPH_REQUEST_ERRORS = Counter(
+    "tigergraph_request_errors_total",
+    "Failed TigerGraph REST calls by operation",
+    ["operation"]
+)
+
+IMPORT_PHASE_SECONDS = Histogram(
+    "import_phase_seconds",
+    "Duration of each asset import phase",
+    ["phase"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+
+IMPORT_RECORDS = Counter(
+    "import_records_total",
+    "Records processed by each asset import phase",
+    ["phase"]
+)
+
+IMPORT_RECORDS_PER_SECOND = Gauge(
+    "import_records_per_second",
+    "Throughput of the most recent run of each import phase",
+    ["phase"]
+)
+
+UNRESOLVED_REFERENCES = Counter(
+    "import_unresolved_references_total",
+    "Pod references to a node or namespace that was not discovered, by reference",
+    ["reference"]
+)
+
+RESILIENCE_RETRIES = Counter(
+    "resilience_retries_total",
+    "Retries of transient failures, by policy",
+    ["policy"]
+)
+
+RESILIENCE_REJECTED = Counter(
+    "resilience_rejected_total",
+    "Calls rejected without being attempted because the circuit was open",
+    ["policy"]
+)
+
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 = closed, 1 = half-open, 2 = open)",
+    ["policy"]
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds",
+    "API endpoint latency",
+    ["method", "path", "status"]
+)
+
+@contextmanager
+def import_phase(phase: str) -> Iterator[dict]:
+    """Times an import phase; set result["records"] inside the block to record throughput."""
+    result = {"records": 0}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        elapsed = time.perf_counter() - start
+        IMPORT_PHASE_SECONDS.labels(phase).observe(elapsed)
+        if result["records"]:
+            IMPORT_RECORDS.labels(phase).inc(result["records"])
+            if elapsed > 0:
+                IMPORT_RECORDS_PER_SECOND.labels(phase).set(result["records"] / elapsed)
+
+def record_unresolved_references(reference: str, count: int):
+    # Callers aggregate locally so hot loops don't take the metric lock per lookup
+    if count:
+        UNRESOLVED_REFERENCES.labels(reference).inc(count)
+
+# Worker profilers of the innermost active profiled() block
+_profile_workers: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar("profile_workers", default=None)
+
+def profile_worker(fn: Callable) -> Callable:
+    """Wraps `fn` so it is also profiled on the worker thread that runs it.
+
+    cProfile only records the thread that enabled it, so work submitted to a
+    thread pool from inside profiled() would otherwise be missing from the
+    dump. Outside profiled() `fn` is returned unchanged.
+    """
+    workers = _profile_workers.get()
+    # From 3.12 cProfile uses sys.monitoring, which is process-wide: the
+    # profiled() profiler already sees every thread and a second one can't start
+    if workers is None or sys.version_info >= (3, 12):
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            logger.warning(f"Not profiling worker for {getattr(fn, '__qualname__', fn)}: {e}")
+            return fn(*args, **kwargs)
+        # Only profilers that actually ran are merged by profiled()
+        workers.append(profiler)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+
+    return run
+
+@contextmanager
+def profiled(name: str, enabled: bool, profile_dir: str) -> Iterator[Optional[str]]:
+    """Runs the block under cProfile when enabled and dumps stats to profile_dir.
+
+    Yields the path the .prof file will be written to, or None when disabled.
+    """
+    if not enabled:
+        yield None
+        return
+
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.prof")
+    workers: List[cProfile.Profile] = []
+    token = _profile_workers.set(workers)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield path
+    finally:
+        profiler.disable()
+        _profile_workers.reset(token)
+        # Merge the calling thread with the pool workers started via profile_worker()
+        stats = pstats.Stats(profiler)
+        for worker in workers:
+            stats.add(worker)
+        stats.dump_stats(path)
+        logger.info(f"Wrote profile for {name} to {path}")
@@ -0,0 +1,183 @@
+from typing import Any, Callable, Optional
+import logging
+import random
+import threading
+import time
+
+from metrics import CIRCUIT_STATE, RESILIENCE_RETRIES, RESILIENCE_REJECTED
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+class TokenBucket:
+    """Blocking token-bucket rate limiter; a rate of 0 disables limiting."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets a single
+    trial call through once `reset_timeout` seconds have passed."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._state = self.CLOSED
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(0)
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            logger.warning(f"Circuit {self.name} changed from {self._state} to {state}")
+        self._state = state
+        CIRCUIT_STATE.labels(self.name).set(self._STATE_VALUES[state])
+
+    def before_call(self):
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    RESILIENCE_REJECTED.labels(self.name).inc()
+                    raise CircuitOpenError(f"Circuit {self.name} is open")
+                self._set_state(self.HALF_OPEN)
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    RESILIENCE_REJECTED.labels(self.name).inc()
+                    raise CircuitOpenError(f"Circuit {self.name} is half-open, trial call in progress")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+class ResiliencePolicy:
+    """Rate limiting, jittered exponential retries and circuit breaking around a call.
+
+    Exceptions for which `is_transient` returns True are retried and counted
+    against the circuit breaker. Those for which `is_rejection` returns True
+    mean the dependency answered and turned this request down (a 4xx), so
+    they count as healthy; any other error is raised without retrying but
+    still counts against the breaker.
+    """
+
+    def __init__(self, name: str, rate: float = 0.0, burst: int = 1, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 10.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 is_transient: Optional[Callable[[Exception], bool]] = None,
+                 is_rejection: Optional[Callable[[Exception], bool]] = None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_transient = is_transient or (lambda exc: True)
+        self.is_rejection = is_rejection or (lambda exc: False)
+        self.limiter = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+
+    def derive(self, name: str, is_transient: Optional[Callable[[Exception], bool]] = None,
+               is_rejection: Optional[Callable[[Exception], bool]] = None) -> "ResiliencePolicy":
+        """Returns a policy with the same settings but its own limiter and breaker."""
+        return ResiliencePolicy(
+            name,
+            rate=self.rate,
+            burst=self.burst,
+            max_retries=self.max_retries,
+            backoff_base=self.backoff_base,
+            backoff_max=self.backoff_max,
+            failure_threshold=self.failure_threshold,
+            reset_timeout=self.reset_timeout,
+            is_transient=is_transient or self.is_transient,
+            is_rejection=is_rejection or self.is_rejection
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, fn: Callable[..., Any], *args, idempotent: bool = True, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self.limiter.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not self.is_transient(e):
+                    if self.is_rejection(e):
+                        # The dependency answered, it just rejected this request
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.record_failure()
+                    raise
+                self.breaker.record_failure()
+                if not idempotent or attempt >= self.max_retries or self.breaker.state == CircuitBreaker.OPEN:
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                RESILIENCE_RETRIES.labels(self.name).inc()
+                logger.warning(f"{self.name}: transient error ({e}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+def policy_from_settings(settings, prefix: str) -> ResiliencePolicy:
+    """Builds a policy from the `<prefix>_rate_limit`, `<prefix>_max_retries`, ... settings."""
+    return ResiliencePolicy(
+        prefix,
+        rate=getattr(settings, f"{prefix}_rate_limit"),
+        burst=getattr(settings, f"{prefix}_rate_burst"),
+        max_retries=getattr(settings, f"{prefix}_max_retries"),
+        backoff_base=settings.retry_backoff_base,
+        backoff_max=settings.retry_backoff_max,
+        failure_threshold=getattr(settings, f"{prefix}_breaker_threshold"),
+        reset_timeout=getattr(settings, f"{prefix}_breaker_reset_seconds")
+    )
@@ -0,0 +1,340 @@
+"""Declared TigerGraph schema for K8sSecurityGraph.
+
+Vertex/edge types and their attribute types are declared once here. The
+same declarations drive schema bootstrap/migration, the generated loading
+job and the projection of discovery output into loading payloads.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import argparse
+import csv
+import io
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+LOADING_JOB_NAME = "load_k8s_assets"
+MIGRATION_JOB_NAME = "migrate_k8s_schema"
+GLOBAL_MIGRATION_JOB_NAME = "migrate_k8s_global_schema"
+CSV_SEPARATOR = ","
+
+@dataclass(frozen=True)
+class Attribute:
+    name: str
+    type: str = "STRING"
+    # Key in the discovery record, when it differs from the attribute name
+    source: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return self.source or self.name
+
+    def convert(self, value: Any) -> Any:
+        if self.type in ("INT", "UINT"):
+            return int(value) if value not in (None, "") else 0
+        if self.type == "DOUBLE":
+            return float(value) if value not in (None, "") else 0.0
+        if self.type == "BOOL":
+            return bool(value)
+        return "" if value is None else str(value)
+
+@dataclass(frozen=True)
+class VertexType:
+    name: str
+    attributes: Tuple[Attribute, ...]
+
+    def ddl(self) -> str:
+        columns = ", ".join(f"{attr.name} {attr.type}" for attr in self.attributes)
+        return f"VERTEX {self.name} (PRIMARY_ID id STRING, {columns})"
+
+@dataclass(frozen=True)
+class EdgeType:
+    name: str
+    from_type: str
+    to_type: str
+    directed: bool = False
+    attributes: Tuple[Attribute, ...] = ()
+
+    def ddl(self) -> str:
+        kind = "DIRECTED" if self.directed else "UNDIRECTED"
+        columns = "".join(f", {attr.name} {attr.type}" for attr in self.attributes)
+        return f"{kind} EDGE {self.name} (FROM {self.from_type}, TO {self.to_type}{columns})"
+
+def _attrs(*names: str) -> Tuple[Attribute, ...]:
+    return tuple(Attribute(name) for name in names)
+
+VERTEX_TYPES: Tuple[VertexType, ...] = (
+    VertexType("K8sNode", _attrs("cluster", "name", "labels", "status", "creation_time")),
+    VertexType("Pod", _attrs("cluster", "name", "namespace", "status", "node", "creation_time")),
+    VertexType("Service", _attrs("cluster", "name", "namespace", "type") + (
+        Attribute("clusterIP", source="cluster_ip"),
+        Attribute("creation_time")
+    )),
+    VertexType("Deployment", _attrs("cluster", "name", "namespace") + (
+        Attribute("replicas", "INT"),
+        Attribute("creation_time")
+    )),
+    VertexType("ConfigMap", _attrs("cluster", "name", "namespace", "creation_time")),
+    VertexType("Secret", _attrs("cluster", "name", "namespace", "type", "creation_time")),
+    VertexType("Namespace", _attrs("cluster", "name", "status", "creation_time")),
+    VertexType("RBAC", _attrs("cluster", "type", "rules", "name", "namespace", "creation_time")),
+    VertexType("Container", _attrs("cluster", "name", "image", "ports")),
+)
+
+EDGE_TYPES: Tuple[EdgeType, ...] = (
+    EdgeType("runs_on", "Pod", "K8sNode"),
+    EdgeType("exposes", "Service", "Pod"),
+    EdgeType("manages", "Deployment", "Pod"),
+    EdgeType("uses_config", "Pod", "ConfigMap"),
+    EdgeType("uses_secret", "Pod", "Secret"),
+    EdgeType("contains", "Namespace", "Pod"),
+    EdgeType("has_permission", "RBAC", "Pod"),
+    EdgeType("has_container", "Pod", "Container"),
+)
+
+_VERTEX_TYPES_BY_NAME = {vertex_type.name: vertex_type for vertex_type in VERTEX_TYPES}
+_EDGE_TYPES_BY_NAME = {edge_type.name: edge_type for edge_type in EDGE_TYPES}
+
+def vertex_type(name: str) -> VertexType:
+    if name not in _VERTEX_TYPES_BY_NAME:
+        raise ValueError(f"Undeclared vertex type: {name}")
+    return _VERTEX_TYPES_BY_NAME[name]
+
+def edge_type(name: str) -> EdgeType:
+    if name not in _EDGE_TYPES_BY_NAME:
+        raise ValueError(f"Undeclared edge type: {name}")
+    return _EDGE_TYPES_BY_NAME[name]
+
+def project_vertex(type_name: str, record: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Returns (id, attributes) keeping only declared attributes; nested data is dropped."""
+    return record["id"], {attr.name: attr.convert(record.get(attr.key)) for attr in vertex_type(type_name).attributes}
+
+def project_edge_attributes(type_name: str, attributes: Dict[str, Any]) -> Dict[str, Any]:
+    return {attr.name: attr.convert(attributes.get(attr.key)) for attr in edge_type(type_name).attributes}
+
+def file_tag(type_name: str) -> str:
+    """Loading job FILENAME variable for a vertex or edge type."""
+    return f"f_{type_name}"
+
+def _csv_value(value: Any) -> Any:
+    # The loading job reads one record per line
+    return value.replace("\r", " ").replace("\n", " ") if isinstance(value, str) else value
+
+def vertex_rows_to_csv(type_name: str, items: Iterable[Tuple[str, Dict[str, Any]]]) -> str:
+    """CSV payload for the loading job: id followed by attributes in declared order, no header."""
+    attributes = vertex_type(type_name).attributes
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=CSV_SEPARATOR, lineterminator="\n")
+    for vertex_id, values in items:
+        writer.writerow([_csv_value(vertex_id)] + [_csv_value(values.get(attr.name, "")) for attr in attributes])
+    return out.getvalue()
+
+def edge_rows_to_csv(type_name: str, items: Iterable[Tuple[str, str, Dict[str, Any]]]) -> str:
+    """CSV payload for the loading job: source id, target id, then attributes, no header."""
+    attributes = edge_type(type_name).attributes
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=CSV_SEPARATOR, lineterminator="\n")
+    for source_id, target_id, values in items:
+        writer.writerow([_csv_value(source_id), _csv_value(target_id)] +
+                        [_csv_value(values.get(attr.name, "")) for attr in attributes])
+    return out.getvalue()
+
+def create_schema_gsql(graph_name: str) -> str:
+    """GSQL that creates every declared type and the graph from scratch."""
+    statements = [f"CREATE {vertex.ddl()}" for vertex in VERTEX_TYPES]
+    statements += [f"CREATE {edge.ddl()}" for edge in EDGE_TYPES]
+    type_names = [vertex.name for vertex in VERTEX_TYPES] + [edge.name for edge in EDGE_TYPES]
+    statements.append(f"CREATE GRAPH {graph_name}({', '.join(type_names)})")
+    return "\n".join(statements)
+
+def loading_job_gsql(graph_name: str) -> str:
+    """GSQL that (re)creates the loading job with one FILENAME per declared type."""
+    lines = [f"USE GRAPH {graph_name}", f"DROP JOB {LOADING_JOB_NAME}",
+             f"CREATE LOADING JOB {LOADING_JOB_NAME} FOR GRAPH {graph_name} {{"]
+    for vertex in VERTEX_TYPES:
+        lines.append(f"    DEFINE FILENAME {file_tag(vertex.name)};")
+    for edge in EDGE_TYPES:
+        lines.append(f"    DEFINE FILENAME {file_tag(edge.name)};")
+    using = f'USING SEPARATOR="{CSV_SEPARATOR}", HEADER="false", QUOTE="double"'
+    for vertex in VERTEX_TYPES:
+        columns = ", ".join(f"${i}" for i in range(len(vertex.attributes) + 1))
+        lines.append(f"    LOAD {file_tag(vertex.name)} TO VERTEX {vertex.name} VALUES({columns}) {using};")
+    for edge in EDGE_TYPES:
+        columns = ", ".join(f"${i}" for i in range(len(edge.attributes) + 2))
+        lines.append(f"    LOAD {file_tag(edge.name)} TO EDGE {edge.name} VALUES({columns}) {using};")
+    lines.append("}")
+    return "\n".join(lines)
+
+def migration_gsql(graph_name: str, existing_schema: Dict[str, Any],
+                   global_types: Optional[Set[str]] = None) -> Optional[str]:
+    """GSQL schema change jobs adding the declared types/attributes missing from
+    `existing_schema` (as returned by getSchema), or None when nothing is missing.
+
+    `global_types` names the existing types that are global (see
+    SchemaManager.global_type_names); attributes of those are added by a
+    global job, attributes of graph-local types by the graph's own job.
+    When None every existing type is assumed global, as the setup scripts
+    used to create them. Attributes are only ever added, never dropped or retyped.
+    """
+    existing_vertices = {
+        vertex["Name"]: {attr["AttributeName"] for attr in vertex.get("Attributes", [])}
+        for vertex in existing_schema.get("VertexTypes", [])
+    }
+    existing_edges = {
+        edge["Name"]: {attr["AttributeName"] for attr in edge.get("Attributes", [])}
+        for edge in existing_schema.get("EdgeTypes", [])
+    }
+
+    def is_global(type_name: str) -> bool:
+        return global_types is None or type_name in global_types
+
+    # New types go into the graph (so they are local); ALTERs go into the job
+    # matching where the existing type lives
+    local_changes, global_changes = [], []
+    for vertex in VERTEX_TYPES:
+        if vertex.name not in existing_vertices:
+            local_changes.append(f"ADD {vertex.ddl()};")
+            continue
+        missing = [attr for attr in vertex.attributes if attr.name not in existing_vertices[vertex.name]]
+        if missing:
+            columns = ", ".join(f"{attr.name} {attr.type}" for attr in missing)
+            changes = global_changes if is_global(vertex.name) else local_changes
+            changes.append(f"ALTER VERTEX {vertex.name} ADD ATTRIBUTE ({columns});")
+    for edge in EDGE_TYPES:
+        if edge.name not in existing_edges:
+            local_changes.append(f"ADD {edge.ddl()};")
+            continue
+        missing = [attr for attr in edge.attributes if attr.name not in existing_edges[edge.name]]
+        if missing:
+            columns = ", ".join(f"{attr.name} {attr.type}" for attr in missing)
+            changes = global_changes if is_global(edge.name) else local_changes
+            changes.append(f"ALTER EDGE {edge.name} ADD ATTRIBUTE ({columns});")
+
+    lines = []
+    if global_changes:
+        lines += [
+            "USE GLOBAL",
+            f"CREATE GLOBAL SCHEMA_CHANGE JOB {GLOBAL_MIGRATION_JOB_NAME} {{",
+            *(f"    {change}" for change in global_changes),
+            "}",
+            f"RUN GLOBAL SCHEMA_CHANGE JOB {GLOBAL_MIGRATION_JOB_NAME}",
+            f"DROP JOB {GLOBAL_MIGRATION_JOB_NAME}"
+        ]
+    if local_changes:
+        lines += [
+            f"USE GRAPH {graph_name}",
+            f"CREATE SCHEMA_CHANGE JOB {MIGRATION_JOB_NAME} FOR GRAPH {graph_name} {{",
+            *(f"    {change}" for change in local_changes),
+            "}",
+            f"RUN SCHEMA_CHANGE JOB {MIGRATION_JOB_NAME}",
+            f"DROP JOB {MIGRATION_JOB_NAME}"
+        ]
+    return "\n".join(lines) if lines else None
+
+class SchemaError(Exception):
+    """Raised when GSQL output shows that a schema statement did not succeed."""
+
+class SchemaManager:
+    """Creates or migrates the graph schema and installs the loading job."""
+
+    def __init__(self, tg_manager):
+        self.tg = tg_manager
+        self.graph_name = tg_manager.graph_name
+
+    def _gsql(self, text: str, operation: str, success_markers: List[str]) -> str:
+        """Runs GSQL and raises SchemaError unless every success marker is in the output.
+
+        The gsql endpoint answers 200 even when a statement fails, so the
+        output is the only place a failed ALTER or schema change shows up.
+        """
+        result = str(self.tg._call("gsql", text, operation=operation, idempotent=False))
+        logger.info(f"GSQL {operation} output: {result}")
+        missing = [marker for marker in success_markers if marker.lower() not in result.lower()]
+        if missing:
+            raise SchemaError(f"GSQL {operation} failed, expected {missing} in output: {result}")
+        return result
+
+    def _list_global(self) -> str:
+        # LS in the global scope lists the global vertex/edge types and all graphs
+        return str(self.tg._call("gsql", "USE GLOBAL\nLS", operation="list_global"))
+
+    def graph_exists(self) -> bool:
+        return re.search(rf"\bGraph\s+{re.escape(self.graph_name)}\s*\(", self._list_global()) is not None
+
+    def global_type_names(self) -> Set[str]:
+        """Names of the global vertex and edge types; types missing here are graph-local."""
+        output = self._list_global()
+        return set(re.findall(r"-\s+(?:VERTEX|(?:UN)?DIRECTED\s+EDGE)\s+(\w+)\s*\(", output))
+
+    def ensure_schema(self) -> List[str]:
+        """Bootstraps the graph if it does not exist, otherwise adds whatever is missing.
+
+        Returns the GSQL that was run.
+        """
+        from pyTigerGraph import TigerGraphException
+
+        try:
+            existing = self.tg._call("getSchema", udts=False, force=True)
+        except TigerGraphException as e:
+            # Auth failures and the like also surface here, only bootstrap
+            # once the graph is confirmed to be absent
+            if self.graph_exists():
+                raise
+            logger.info(f"Graph {self.graph_name} does not exist ({e}), creating it")
+            text = create_schema_gsql(self.graph_name)
+            self._gsql(text, operation="create_schema", success_markers=[f"The graph {self.graph_name} is created"])
+            return [text]
+
+        text = migration_gsql(self.graph_name, existing, self.global_type_names())
+        if text is None:
+            logger.info(f"Graph {self.graph_name} schema is up to date")
+        else:
+            markers = []
+            if f"RUN GLOBAL SCHEMA_CHANGE JOB {GLOBAL_MIGRATION_JOB_NAME}" in text:
+                markers.append("Global schema change succeeded")
+            if f"RUN SCHEMA_CHANGE JOB {MIGRATION_JOB_NAME}" in text:
+                markers.append("Local schema change succeeded")
+            self._gsql(text, operation="migrate_schema", success_markers=markers)
+        # Run on every existing graph (not only right after `cluster` is added)
+        # so a failed cleanup is retried by the next ensure_schema
+        if self.tg.clear_legacy_vertices() is None:
+            raise SchemaError(f"Failed to delete vertices without a cluster from graph {self.graph_name}")
+        return [text] if text else []
+
+    def install_loading_job(self) -> str:
+        text = loading_job_gsql(self.graph_name)
+        self._gsql(text, operation="install_loading_job", success_markers=["Successfully created loading jobs"])
+        return text
+
+if __name__ == "__main__":
+    # Printing only needs the standard library, so setup scripts can run it
+    # on a host without the backend requirements installed
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Print or apply the K8sSecurityGraph schema")
+    parser.add_argument("--apply", action="store_true", help="Create/migrate the schema and install the loading job")
+    parser.add_argument("--graph", default=os.environ.get("TIGERGRAPH_GRAPH_NAME", "K8sSecurityGraph"),
+                        help="Graph name to print GSQL for (default: $TIGERGRAPH_GRAPH_NAME or K8sSecurityGraph)")
+    args = parser.parse_args()
+
+    if not args.apply:
+        print(create_schema_gsql(args.graph))
+        print()
+        print(loading_job_gsql(args.graph))
+    else:
+        from config import settings
+        from resilience import policy_from_settings
+        from tigergraph_manager import TigerGraphManager
+
+        manager = TigerGraphManager(
+            host=settings.tigergraph_host,
+            port=settings.tigergraph_port,
+            username=settings.tigergraph_username,
+            password=settings.tigergraph_password,
+            graph_name=settings.tigergraph_graph_name,
+            resilience=policy_from_settings(settings, "tigergraph")
+        )
+        schema_manager = SchemaManager(manager)
+        schema_manager.ensure_schema()
+        schema_manager.install_loading_job()
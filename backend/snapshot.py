@@ -0,0 +1,212 @@
+import argparse
+import gzip
+import json
+import logging
+import mmap
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from k8s_discovery import MultiClusterDiscovery
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "k8s-assets-snapshot"
+SNAPSHOT_SCHEMA_VERSION = 1
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Snapshot layout (gzip-compressed NDJSON, one JSON document per line):
+#   {"format": ..., "schema_version": 1, "created": ..., "clusters": [...]}
+#   {"cluster": "<name>", "type": "pods", "count": N}   <- section header
+#   <N asset records>
+#   ...
+# Sections are grouped by cluster so a cluster can be replayed without
+# holding the rest of the snapshot in memory.
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+
+def write_snapshot(path: str, cluster_assets: Dict[str, Dict[str, List[Dict[str, Any]]]]) -> int:
+    """Writes discovery output keyed by cluster to a snapshot file, returns the record count."""
+    records = 0
+    with gzip.open(path, "wb") as out:
+        out.write(_dumps({
+            "format": SNAPSHOT_FORMAT,
+            "schema_version": SNAPSHOT_SCHEMA_VERSION,
+            "created": datetime.now().isoformat(),
+            "clusters": list(cluster_assets.keys())
+        }))
+        for cluster, assets in cluster_assets.items():
+            for asset_type, items in assets.items():
+                out.write(_dumps({"cluster": cluster, "type": asset_type, "count": len(items)}))
+                for item in items:
+                    out.write(_dumps(item))
+                records += len(items)
+    logger.info(f"Wrote {records} records for {len(cluster_assets)} clusters to snapshot {path}")
+    return records
+
+class _SnapshotReader:
+    """Memory-maps a snapshot file and iterates over its lines."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Snapshot {path} is empty")
+        if self._mmap[:2] == GZIP_MAGIC:
+            self._stream = gzip.GzipFile(fileobj=self._mmap, mode="rb")
+        else:
+            self._stream = self._mmap
+        self.header = self._read_header()
+
+    def _read_header(self) -> Dict[str, Any]:
+        header = json.loads(self._stream.readline() or b"{}")
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{self.path} is not a K8s asset snapshot")
+        version = header.get("schema_version")
+        if not isinstance(version, int) or version > SNAPSHOT_SCHEMA_VERSION:
+            raise ValueError(f"Unsupported snapshot schema version: {version}")
+        return header
+
+    def sections(self) -> Iterator[Tuple[Dict[str, Any], Iterator[bytes]]]:
+        """Yields (section header, raw record lines); unread lines are skipped without parsing."""
+        while True:
+            line = self._stream.readline()
+            if not line:
+                return
+            section = json.loads(line)
+            lines = (self._stream.readline() for _ in range(section["count"]))
+            yield section, lines
+            for _ in lines:
+                pass
+
+    def close(self):
+        if self._stream is not self._mmap:
+            self._stream.close()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_snapshot_header(path: str) -> Dict[str, Any]:
+    with _SnapshotReader(path) as reader:
+        return reader.header
+
+def iter_snapshot(path: str, clusters: Optional[List[str]] = None,
+                  asset_types: Optional[List[str]] = None) -> Iterator[Tuple[str, Dict[str, List[Dict[str, Any]]]]]:
+    """Streams (cluster, assets) pairs from a snapshot, one cluster in memory at a time.
+
+    Clusters listed in the header without any section are yielded with no
+    assets. Sections not in `asset_types` are skipped without being parsed.
+    """
+    def wanted(name: str) -> bool:
+        return clusters is None or name in clusters
+
+    with _SnapshotReader(path) as reader:
+        seen = set()
+        current = None
+        assets: Dict[str, List[Dict[str, Any]]] = {}
+        for section, lines in reader.sections():
+            cluster = section["cluster"]
+            if cluster != current:
+                if current is not None and wanted(current):
+                    yield current, assets
+                current, assets = cluster, {}
+                seen.add(cluster)
+            if not wanted(cluster) or (asset_types is not None and section["type"] not in asset_types):
+                continue
+            assets.setdefault(section["type"], []).extend(json.loads(line) for line in lines)
+        if current is not None and wanted(current):
+            yield current, assets
+        for cluster in reader.header.get("clusters", []):
+            if cluster not in seen and wanted(cluster):
+                yield cluster, {}
+
+class SnapshotClusterDiscovery:
+    """Serves one cluster of a snapshot through the K8sAssetDiscovery interface."""
+
+    def __init__(self, path: str, cluster_name: str):
+        self.path = path
+        self.cluster_name = cluster_name
+        # The snapshot never changes, so the node list behind /health is read once
+        self._nodes: Optional[List[Dict[str, Any]]] = None
+
+    def discover_all_assets(self) -> Dict[str, List[Dict[str, Any]]]:
+        for _, assets in iter_snapshot(self.path, clusters=[self.cluster_name]):
+            return assets
+        return {}
+
+    def discover_nodes(self) -> List[Dict[str, Any]]:
+        if self._nodes is None:
+            nodes = []
+            for _, assets in iter_snapshot(self.path, clusters=[self.cluster_name], asset_types=["nodes"]):
+                nodes = assets.get("nodes", [])
+            self._nodes = nodes
+        return self._nodes
+
+class SnapshotDiscovery(MultiClusterDiscovery):
+    """Replay mode: discovery results come from a recorded snapshot instead of the apiserver."""
+
+    def __init__(self, path: str, max_workers: int = 4):
+        self.path = path
+        self.max_workers = max_workers
+        self.header = read_snapshot_header(path)
+        self.clusters = {
+            name: SnapshotClusterDiscovery(path, name) for name in self.header.get("clusters", [])
+        }
+        logger.info(f"Replaying snapshot {path} (schema v{self.header['schema_version']}, created {self.header.get('created')})")
+
+def import_snapshot(tg_manager, path: str, clusters: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Streams a snapshot into TigerGraph cluster by cluster, returns the ImportReport per cluster."""
+    reports = {}
+    for cluster, assets in iter_snapshot(path, clusters=clusters):
+        reports[cluster] = tg_manager.refresh_cluster(assets, cluster=cluster)
+    return reports
+
+if __name__ == "__main__":
+    from config import settings
+    from resilience import policy_from_settings
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Record or replay K8s asset snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record = subparsers.add_parser("record", help="Discover assets and write a snapshot")
+    record.add_argument("path")
+    record.add_argument("--cluster", action="append", dest="clusters")
+    replay = subparsers.add_parser("replay", help="Import a snapshot into TigerGraph")
+    replay.add_argument("path")
+    replay.add_argument("--cluster", action="append", dest="clusters")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        discovery = MultiClusterDiscovery(
+            config_file=settings.k8s_config_file,
+            in_cluster=settings.k8s_in_cluster,
+            contexts=settings.k8s_contexts,
+            cluster_name=settings.k8s_cluster_name,
+            max_workers=settings.k8s_discovery_workers,
+            resilience=policy_from_settings(settings, "k8s")
+        )
+        write_snapshot(args.path, discovery.discover_all_assets(args.clusters))
+    else:
+        from tigergraph_manager import TigerGraphManager
+
+        manager = TigerGraphManager(
+            host=settings.tigergraph_host,
+            port=settings.tigergraph_port,
+            username=settings.tigergraph_username,
+            password=settings.tigergraph_password,
+            graph_name=settings.tigergraph_graph_name,
+            batch_size=settings.tigergraph_batch_size,
+            resilience=policy_from_settings(settings, "tigergraph"),
+            use_loading_job=settings.tigergraph_use_loading_job
+        )
+        for cluster, report in import_snapshot(manager, args.path, clusters=args.clusters).items():
+            print(json.dumps(report.to_dict()))
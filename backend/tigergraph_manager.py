@@ -1,20 +1,155 @@
-from pyTigerGraph import TigerGraphConnection
-from typing import List, Dict, Any
+from pyTigerGraph import TigerGraphConnection, TigerGraphException
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 import json
+import requests
 from datetime import datetime
 
+from metrics import TIGERGRAPH_REQUEST_SECONDS, TIGERGRAPH_REQUEST_ERRORS, import_phase, record_unresolved_references
+from resilience import ResiliencePolicy
+from schema import (
+    VERTEX_TYPES, LOADING_JOB_NAME, CSV_SEPARATOR, file_tag, project_vertex, project_edge_attributes,
+    vertex_rows_to_csv, edge_rows_to_csv
+)
+
 logger = logging.getLogger(__name__)
 
+# RESTPP error codes that mean the service itself is unavailable
+TRANSIENT_TIGERGRAPH_CODES = {"REST-0003"}
+TRANSIENT_TIGERGRAPH_MESSAGES = ("unavailable", "timeout", "timed out", "not ready", "too many requests", "busy")
+
+def _http_status(exc: Exception) -> Optional[int]:
+    response = getattr(exc, "response", None)
+    return response.status_code if response is not None else None
+
+def is_transient_tigergraph_error(exc: Exception) -> bool:
+    # pyTigerGraph checks the JSON body of a non-2xx response before calling
+    # raise_for_status, so a 503 with {"error": true, ...} arrives as a
+    # TigerGraphException without the status; classify those by code/message
+    if isinstance(exc, TigerGraphException):
+        message = str(exc.message).lower()
+        return exc.code in TRANSIENT_TIGERGRAPH_CODES or any(marker in message for marker in TRANSIENT_TIGERGRAPH_MESSAGES)
+    # Connection errors, timeouts and 429/5xx responses without a JSON body
+    if isinstance(exc, requests.exceptions.HTTPError):
+        status = _http_status(exc)
+        return status is None or status == 429 or status >= 500
+    return isinstance(exc, requests.exceptions.RequestException)
+
+def is_tigergraph_rejection(exc: Exception) -> bool:
+    # TigerGraph answered and refused this request (bad payload, unknown type, 4xx)
+    if isinstance(exc, TigerGraphException):
+        return not is_transient_tigergraph_error(exc)
+    if isinstance(exc, requests.exceptions.HTTPError):
+        status = _http_status(exc)
+        return status is not None and 400 <= status < 500 and status != 429
+    return False
+
+class LoadingJobRejectedError(Exception):
+    """Raised when a loading job accepted the request but rejected some of its lines."""
+
+# Loading job statistics that count bad input lines (TigerGraph 3.x puts them at
+# the top of "statistics", newer versions under "fileLevel")
+_LINE_ERROR_KEYS = ("rejectLine", "failedConditionLine", "notEnoughToken", "invalidJson", "oversizeToken")
+_OBJECT_ERROR_PREFIXES = ("invalid", "noId", "incorrect")
+
+def loading_job_rejections(result: Any, lines_sent: int) -> int:
+    """Number of lines or objects a runLoadingJobWithData response reports as not loaded."""
+    if not result:
+        return lines_sent
+    rejected = valid = 0
+    for entry in result if isinstance(result, list) else [result]:
+        stats = entry.get("statistics", {})
+        line_stats = stats.get("fileLevel", stats)
+        valid += int(line_stats.get("validLine", 0) or 0)
+        rejected += sum(int(line_stats.get(key, 0) or 0) for key in _LINE_ERROR_KEYS)
+        object_stats = stats.get("objectLevel", stats)
+        for counts in object_stats.get("vertex", []) + object_stats.get("edge", []):
+            rejected += sum(
+                value for key, value in counts.items()
+                if key.startswith(_OBJECT_ERROR_PREFIXES) and isinstance(value, int)
+            )
+    return max(rejected, lines_sent - valid)
+
+@dataclass
+class ImportBatch:
+    """One upsert request; failed batches keep their payload so they can be replayed."""
+    kind: str
+    type: str
+    index: int
+    items: List[Tuple]
+    source_type: Optional[str] = None
+    target_type: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "type": self.type,
+            "index": self.index,
+            "size": len(self.items),
+            "source_type": self.source_type,
+            "target_type": self.target_type,
+            "first_id": self.items[0][0] if self.items else None,
+            "error": self.error
+        }
+
+@dataclass
+class ImportReport:
+    """Per-batch accounting for one import, listing the batches that need replay."""
+    cluster: Optional[str] = None
+    started: datetime = field(default_factory=datetime.now)
+    finished: Optional[datetime] = None
+    batches_total: int = 0
+    batches_succeeded: int = 0
+    records_succeeded: int = 0
+    failed: List[ImportBatch] = field(default_factory=list)
+    # Set when the import was aborted before any batch was sent
+    error: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        return not self.failed and self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "cluster": self.cluster,
+            "started": self.started.isoformat(),
+            "finished": self.finished.isoformat() if self.finished else None,
+            "complete": self.complete,
+            "error": self.error,
+            "batches_total": self.batches_total,
+            "batches_succeeded": self.batches_succeeded,
+            "batches_failed": len(self.failed),
+            "records_succeeded": self.records_succeeded,
+            "records_failed": sum(len(batch.items) for batch in self.failed),
+            "failed_batches": [batch.to_dict() for batch in self.failed]
+        }
+
+def _chunks(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 class TigerGraphManager:
-    def __init__(self, host: str, port: int, username: str, password: str, graph_name: str):
+    def __init__(self, host: str, port: int, username: str, password: str, graph_name: str,
+                 batch_size: int = 500, resilience: ResiliencePolicy = None, use_loading_job: bool = False,
+                 conn: Any = None):
         self.host = host
         self.port = port
         self.username = username
         self.password = password
         self.graph_name = graph_name
-        self.conn = None
-        self._connect()
+        self.batch_size = batch_size
+        # Send batches as CSV through the generated loading job instead of JSON upserts
+        self.use_loading_job = use_loading_job
+        template = resilience or ResiliencePolicy("tigergraph")
+        self.resilience = template.derive(
+            "tigergraph", is_transient=is_transient_tigergraph_error, is_rejection=is_tigergraph_rejection
+        )
+        # An already built connection (benchmarks pass an in-memory stand-in) skips connecting
+        self.conn = conn
+        if self.conn is None:
+            self._connect()
 
     def _connect(self):
         try:
@@ -39,99 +174,234 @@ class TigerGraphManager:
             # Set the graph
             self.conn.graphname = self.graph_name
             
-            version = self.conn.getVersion()
+            version = self._call("getVersion")
             logger.info(f"Connected to TigerGraph version: {version}")
         except Exception as e:
             logger.error(f"Failed to connect to TigerGraph: {e}")
             raise
 
+    def _call(self, method: str, *args, operation: str = None, idempotent: bool = True, **kwargs):
+        """Invokes a TigerGraphConnection method through the resilience policy,
+        timing each attempt under `operation` (defaults to the method name)."""
+        operation = operation or method
+
+        def attempt():
+            try:
+                with TIGERGRAPH_REQUEST_SECONDS.labels(operation).time():
+                    return getattr(self.conn, method)(*args, **kwargs)
+            except Exception:
+                TIGERGRAPH_REQUEST_ERRORS.labels(operation).inc()
+                raise
+
+        # Reads and upserts/deletes by id are safe to retry; schema changes are not
+        return self.resilience.call(attempt, idempotent=idempotent)
+
     def clear_graph(self):
         try:
             # Delete all vertices to clear the graph
-            result = self.conn.runInterpretedQuery("DELETE FROM K8sNode")
-            result = self.conn.runInterpretedQuery("DELETE FROM Pod")
-            result = self.conn.runInterpretedQuery("DELETE FROM Service")
-            result = self.conn.runInterpretedQuery("DELETE FROM Deployment")
-            result = self.conn.runInterpretedQuery("DELETE FROM ConfigMap")
-            result = self.conn.runInterpretedQuery("DELETE FROM Secret")
-            result = self.conn.runInterpretedQuery("DELETE FROM Namespace")
-            result = self.conn.runInterpretedQuery("DELETE FROM RBAC")
-            result = self.conn.runInterpretedQuery("DELETE FROM Container")
+            result = None
+            for vertex in VERTEX_TYPES:
+                result = self._call("runInterpretedQuery", f"DELETE FROM {vertex.name}", operation="clear_graph")
             logger.info("Graph cleared successfully")
             return result
         except Exception as e:
             logger.error(f"Failed to clear graph: {e}")
             return None
 
-    def insert_vertices(self, vertex_type: str, vertices: List[Dict[str, Any]]):
+    def clear_cluster(self, cluster: str):
+        """Deletes only the vertices (and their edges) that belong to one cluster."""
         try:
-            for vertex in vertices:
-                attributes = {k: v for k, v in vertex.items() if k != 'id'}
-                # Use upsertVertexData instead of upsertVertex
-                result = self.conn.upsertVertexData(
-                    vertexType=vertex_type,
-                    vertexId=vertex['id'],
-                    attributes=attributes
-                )
-            logger.info(f"Inserted {len(vertices)} {vertex_type} vertices")
-            return True
+            vertex_sets = ", ".join(f"{vertex.name}.*" for vertex in VERTEX_TYPES)
+            query = """
+            INTERPRET QUERY (STRING cluster) FOR GRAPH %s {
+                all_vertices = {%s};
+                deleted = SELECT v FROM all_vertices:v
+                          WHERE v.cluster == cluster
+                          ACCUM DELETE(v);
+                PRINT deleted.size() AS deleted;
+            }
+            """ % (self.graph_name, vertex_sets)
+            result = self._call("runInterpretedQuery", query, params={"cluster": cluster}, operation="clear_cluster")
+            logger.info(f"Cleared cluster {cluster} from graph")
+            return result
         except Exception as e:
-            logger.error(f"Failed to insert {vertex_type} vertices: {e}")
-            return False
+            logger.error(f"Failed to clear cluster {cluster}: {e}")
+            return None
 
-    def insert_edges(self, edge_type: str, edges: List[Dict[str, Any]]):
-        try:
-            for edge in edges:
-                result = self.conn.upsertEdgeData(
-                    sourceVertexType=edge['from_type'],
-                    sourceVertexId=edge['from_id'],
-                    edgeType=edge_type,
-                    targetVertexType=edge['to_type'],
-                    targetVertexId=edge['to_id'],
-                    attributes=edge.get('attributes', {})
+    def clear_legacy_vertices(self):
+        """Deletes vertices loaded before ids were cluster-qualified.
+
+        Their cluster attribute is empty once the schema migration adds it, so
+        no cluster refresh would ever replace them.
+        """
+        return self.clear_cluster("")
+
+    def _send_batch(self, batch: ImportBatch):
+        if self.use_loading_job:
+            if batch.kind == "vertex":
+                data = vertex_rows_to_csv(batch.type, batch.items)
+            else:
+                data = edge_rows_to_csv(batch.type, batch.items)
+            result = self._call(
+                "runLoadingJobWithData", data, file_tag(batch.type), LOADING_JOB_NAME,
+                sep=CSV_SEPARATOR, eol="\n", operation=f"load_{batch.kind}"
+            )
+            # The request succeeds even when lines are rejected, so check the statistics;
+            # raised outside _call since resending the same lines would not help
+            rejected = loading_job_rejections(result, len(batch.items))
+            if rejected:
+                raise LoadingJobRejectedError(
+                    f"Loading job rejected {rejected} of {len(batch.items)} {batch.type} lines: {result}"
                 )
+            return result
+        if batch.kind == "vertex":
+            return self._call("upsertVertices", batch.type, batch.items)
+        return self._call("upsertEdges", batch.source_type, batch.type, batch.target_type, batch.items)
+
+    def _run_batches(self, batches: List[ImportBatch], report: ImportReport) -> bool:
+        ok = True
+        for batch in batches:
+            report.batches_total += 1
+            try:
+                self._send_batch(batch)
+                batch.error = None
+                report.batches_succeeded += 1
+                report.records_succeeded += len(batch.items)
+            except Exception as e:
+                batch.error = str(e)
+                report.failed.append(batch)
+                ok = False
+        return ok
+
+    def insert_vertices(self, vertex_type: str, vertices: List[Dict[str, Any]], report: ImportReport = None) -> bool:
+        report = report if report is not None else ImportReport()
+        # Only declared attributes go over the wire, nested data such as pod containers is dropped
+        payload = [project_vertex(vertex_type, vertex) for vertex in vertices]
+        batches = [
+            ImportBatch(kind="vertex", type=vertex_type, index=index, items=items)
+            for index, items in enumerate(_chunks(payload, self.batch_size))
+        ]
+        failed_before = len(report.failed)
+        ok = self._run_batches(batches, report)
+        if ok:
+            logger.info(f"Inserted {len(vertices)} {vertex_type} vertices")
+        else:
+            logger.error(f"Failed to insert {len(report.failed) - failed_before} of {len(batches)} {vertex_type} vertex batches")
+        return ok
+
+    def insert_edges(self, edge_type: str, edges: List[Dict[str, Any]], report: ImportReport = None) -> bool:
+        report = report if report is not None else ImportReport()
+        # upsertEdges takes one source/target vertex type per request
+        by_endpoint_types: Dict[Tuple[str, str], List[Tuple]] = {}
+        for edge in edges:
+            by_endpoint_types.setdefault((edge['from_type'], edge['to_type']), []).append(
+                (edge['from_id'], edge['to_id'], project_edge_attributes(edge_type, edge.get('attributes', {})))
+            )
+        batches = []
+        for (from_type, to_type), payload in by_endpoint_types.items():
+            for items in _chunks(payload, self.batch_size):
+                batches.append(ImportBatch(
+                    kind="edge", type=edge_type, index=len(batches), items=items,
+                    source_type=from_type, target_type=to_type
+                ))
+        failed_before = len(report.failed)
+        ok = self._run_batches(batches, report)
+        if ok:
             logger.info(f"Inserted {len(edges)} {edge_type} edges")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to insert {edge_type} edges: {e}")
-            return False
+        else:
+            logger.error(f"Failed to insert {len(report.failed) - failed_before} of {len(batches)} {edge_type} edge batches")
+        return ok
+
+    def replay_failed(self, report: ImportReport) -> ImportReport:
+        """Re-sends only the failed batches of a previous import."""
+        replay = ImportReport(cluster=report.cluster)
+        self._run_batches(report.failed, replay)
+        replay.finished = datetime.now()
+        logger.info(f"Replayed {replay.batches_total} batches for cluster {report.cluster or 'default'}, "
+                    f"{len(replay.failed)} still failing")
+        return replay
 
-    def import_k8s_assets(self, assets: Dict[str, List[Dict[str, Any]]]):
-        logger.info("Starting to import K8s assets into TigerGraph")
+    def import_k8s_assets(self, assets: Dict[str, List[Dict[str, Any]]], cluster: str = None) -> ImportReport:
+        """Imports the assets of a single cluster; other clusters are left untouched.
+
+        Failed batches do not abort the import, they are listed in the returned report.
+        """
+        logger.info(f"Starting to import K8s assets into TigerGraph (cluster: {cluster or 'default'})")
+        report = ImportReport(cluster=cluster)
+        
+        with import_phase("vertices") as phase:
+            phase["records"] = self.import_vertices(assets, report)
+        
+        with import_phase("relationships") as phase:
+            phase["records"] = self.import_relationships(assets, report)
         
-        # Insert vertices
-        self.insert_vertices("Namespace", assets.get('namespaces', []))
-        self.insert_vertices("K8sNode", assets.get('nodes', []))
-        self.insert_vertices("Pod", assets.get('pods', []))
-        self.insert_vertices("Service", assets.get('services', []))
-        self.insert_vertices("Deployment", assets.get('deployments', []))
-        self.insert_vertices("ConfigMap", assets.get('configmaps', []))
-        self.insert_vertices("Secret", assets.get('secrets', []))
-        self.insert_vertices("RBAC", assets.get('rbac', []))
+        report.finished = datetime.now()
+        if report.complete:
+            logger.info(f"Completed importing K8s assets into TigerGraph (cluster: {cluster or 'default'})")
+        else:
+            logger.error(f"Imported K8s assets into TigerGraph with {len(report.failed)} failed batches "
+                         f"(cluster: {cluster or 'default'})")
+        return report
+
+    def import_vertices(self, assets: Dict[str, List[Dict[str, Any]]], report: ImportReport) -> int:
+        """Upserts every vertex of one cluster, returns the number of vertices sent."""
+        self.insert_vertices("Namespace", assets.get('namespaces', []), report)
+        self.insert_vertices("K8sNode", assets.get('nodes', []), report)
+        self.insert_vertices("Pod", assets.get('pods', []), report)
+        self.insert_vertices("Service", assets.get('services', []), report)
+        self.insert_vertices("Deployment", assets.get('deployments', []), report)
+        self.insert_vertices("ConfigMap", assets.get('configmaps', []), report)
+        self.insert_vertices("Secret", assets.get('secrets', []), report)
+        self.insert_vertices("RBAC", assets.get('rbac', []), report)
         
         # Insert containers
         containers = []
         for pod in assets.get('pods', []):
             for container in pod.get('containers', []):
                 containers.append(container)
-        self.insert_vertices("Container", containers)
-        
-        # Insert edges
-        self._create_relationships(assets)
-        
-        logger.info("Completed importing K8s assets into TigerGraph")
+        self.insert_vertices("Container", containers, report)
+        return sum(len(items) for items in assets.values()) + len(containers)
 
-    def _create_relationships(self, assets: Dict[str, List[Dict[str, Any]]]):
+    def import_relationships(self, assets: Dict[str, List[Dict[str, Any]]], report: ImportReport) -> int:
+        """Builds and upserts the edges of one cluster, returns the number of edges sent."""
+        return self._create_relationships(assets, report)
+
+    def refresh_cluster(self, assets: Dict[str, List[Dict[str, Any]]], cluster: str) -> ImportReport:
+        """Replaces the data of one cluster: clears it, then imports `assets`.
+
+        If the clear fails nothing is imported, so stale vertices are never
+        mixed with fresh ones; the returned report carries the error.
+        """
+        with import_phase("clear"):
+            cleared = self.clear_cluster(cluster)
+        if cleared is None:
+            report = ImportReport(cluster=cluster, error=f"Failed to clear existing data of cluster {cluster}")
+            report.finished = datetime.now()
+            logger.error(f"Skipping import of cluster {cluster}: {report.error}")
+            return report
+        return self.import_k8s_assets(assets, cluster=cluster)
+
+    def _create_relationships(self, assets: Dict[str, List[Dict[str, Any]]], report: ImportReport = None) -> int:
         edges = []
         
+        # Vertex ids are cluster-qualified, pods reference nodes and namespaces by name
+        node_ids = {node['name']: node['id'] for node in assets.get('nodes', [])}
+        namespace_ids = {ns['name']: ns['id'] for ns in assets.get('namespaces', [])}
+        
         # Pod -> Node (runs_on)
+        # Pods that reference a node or namespace missing from discovery get no edge
+        unresolved_nodes = unresolved_namespaces = 0
         for pod in assets.get('pods', []):
-            if pod.get('node'):
+            if not pod.get('node'):
+                continue
+            if pod['node'] not in node_ids:
+                unresolved_nodes += 1
+            else:
                 edges.append({
                     'from_type': 'Pod',
                     'from_id': pod['id'],
                     'to_type': 'K8sNode',
-                    'to_id': pod['node']
+                    'to_id': node_ids[pod['node']]
                 })
         
         # Service -> Pod (exposes)
@@ -158,10 +428,14 @@ class TigerGraphManager:
         
         # Namespace -> Pod (contains)
         for pod in assets.get('pods', []):
-            if pod.get('namespace'):
+            if not pod.get('namespace'):
+                continue
+            if pod['namespace'] not in namespace_ids:
+                unresolved_namespaces += 1
+            else:
                 edges.append({
                     'from_type': 'Namespace',
-                    'from_id': pod['namespace'],
+                    'from_id': namespace_ids[pod['namespace']],
                     'to_type': 'Pod',
                     'to_id': pod['id']
                 })
@@ -201,17 +475,24 @@ class TigerGraphManager:
                 })
         
         # Insert all edges
-        self.insert_edges("runs_on", edges[:len([e for e in edges if 'runs_on' in e])])
-        self.insert_edges("exposes", [e for e in edges if e['from_type'] == 'Service'])
-        self.insert_edges("manages", [e for e in edges if e['from_type'] == 'Deployment'])
-        self.insert_edges("contains", [e for e in edges if e['from_type'] == 'Namespace'])
-        self.insert_edges("uses_config", [e for e in edges if e['to_type'] == 'ConfigMap'])
-        self.insert_edges("uses_secret", [e for e in edges if e['to_type'] == 'Secret'])
-        self.insert_edges("has_container", [e for e in edges if e['to_type'] == 'Container'])
+        self.insert_edges("runs_on", [e for e in edges if e['to_type'] == 'K8sNode'], report)
+        self.insert_edges("exposes", [e for e in edges if e['from_type'] == 'Service'], report)
+        self.insert_edges("manages", [e for e in edges if e['from_type'] == 'Deployment'], report)
+        self.insert_edges("contains", [e for e in edges if e['from_type'] == 'Namespace'], report)
+        self.insert_edges("uses_config", [e for e in edges if e['to_type'] == 'ConfigMap'], report)
+        self.insert_edges("uses_secret", [e for e in edges if e['to_type'] == 'Secret'], report)
+        self.insert_edges("has_container", [e for e in edges if e['to_type'] == 'Container'], report)
+        
+        record_unresolved_references("pod_node", unresolved_nodes)
+        record_unresolved_references("pod_namespace", unresolved_namespaces)
+        return len(edges)
 
     def _get_pods_for_service(self, service: Dict, pods: List[Dict]) -> List[Dict]:
         matching_pods = []
-        service_labels = service.get('selector', {})
+        service_labels = service.get('selector') or {}
+        # A service without a selector does not select any pods
+        if not service_labels:
+            return matching_pods
         for pod in pods:
             if pod['namespace'] == service['namespace']:
                 pod_labels = pod.get('labels', {})
@@ -268,7 +549,7 @@ class TigerGraphManager:
                 "target_type": target_type or ""
             }
             
-            result = self.conn.runInterpretedQuery(query, params=params)
+            result = self._call("runInterpretedQuery", query, params=params, operation="query_attack_paths")
             return result
         except Exception as e:
             logger.error(f"Failed to query attack paths: {e}")
@@ -277,8 +558,8 @@ class TigerGraphManager:
     def get_graph_statistics(self):
         try:
             # Use getEdgeStatistics and getVertexStatistics instead
-            vertex_stats = self.conn.getVertexStatistics()
-            edge_stats = self.conn.getEdgeStatistics()
+            vertex_stats = self._call("getVertexStatistics")
+            edge_stats = self._call("getEdgeStatistics")
             return {
                 'vertexCount': sum(vertex_stats.values()) if vertex_stats else 0,
                 'edgeCount': sum(edge_stats.values()) if edge_stats else 0,
@@ -295,8 +576,8 @@ class TigerGraphManager:
             vertices_query = "SELECT v FROM K8sNode:v"
             edges_query = "SELECT e FROM ANY:e"
             
-            vertices = self.conn.runInterpretedQuery(vertices_query)
-            edges = self.conn.runInterpretedQuery(edges_query)
+            vertices = self._call("runInterpretedQuery", vertices_query, operation="visual_graph_vertices")
+            edges = self._call("runInterpretedQuery", edges_query, operation="visual_graph_edges")
             
             return {
                 "vertices": vertices,
@@ -25,27 +25,9 @@ sleep 30
 # 获取 Pod 名称
 POD_NAME=$(kubectl get pods -n tigergraph -l app=tigergraph -o jsonpath='{.items[0].metadata.name}')
 
-# 在 TigerGraph Pod 中执行初始化命令
-kubectl exec -it $POD_NAME -n tigergraph -- bash -c "
-gsql -e 'CREATE VERTEX K8sNode (PRIMARY_ID id STRING, name STRING, labels STRING, status STRING)'
-gsql -e 'CREATE VERTEX Pod (PRIMARY_ID id STRING, name STRING, namespace STRING, status STRING, node STRING)'
-gsql -e 'CREATE VERTEX Service (PRIMARY_ID id STRING, name STRING, namespace STRING, type STRING, clusterIP STRING)'
-gsql -e 'CREATE VERTEX Deployment (PRIMARY_ID id STRING, name STRING, namespace STRING, replicas INT32)'
-gsql -e 'CREATE VERTEX ConfigMap (PRIMARY_ID id STRING, name STRING, namespace STRING)'
-gsql -e 'CREATE VERTEX Secret (PRIMARY_ID id STRING, name STRING, namespace STRING, type STRING)'
-gsql -e 'CREATE VERTEX Namespace (PRIMARY_ID id STRING, name STRING, status STRING)'
-gsql -e 'CREATE VERTEX RBAC (PRIMARY_ID id STRING, type STRING, rules STRING)'
-gsql -e 'CREATE VERTEX Container (PRIMARY_ID id STRING, name STRING, image STRING, ports STRING)'
-gsql -e 'CREATE UNDIRECTED EDGE runs_on (FROM Pod, TO K8sNode)'
-gsql -e 'CREATE UNDIRECTED EDGE exposes (FROM Service, TO Pod)'
-gsql -e 'CREATE UNDIRECTED EDGE manages (FROM Deployment, TO Pod)'
-gsql -e 'CREATE UNDIRECTED EDGE uses_config (FROM Pod, TO ConfigMap)'
-gsql -e 'CREATE UNDIRECTED EDGE uses_secret (FROM Pod, TO Secret)'
-gsql -e 'CREATE UNDIRECTED EDGE contains (FROM Namespace, TO Pod)'
-gsql -e 'CREATE UNDIRECTED EDGE has_permission (FROM RBAC, TO Pod)'
-gsql -e 'CREATE UNDIRECTED EDGE has_container (FROM Pod, TO Container)'
-gsql -e 'CREATE GRAPH K8sSecurityGraph(K8sNode, Pod, Service, Deployment, ConfigMap, Secret, Namespace, RBAC, Container, runs_on, exposes, manages, uses_config, uses_secret, contains, has_permission, has_container)'
-gsql -e 'USE GRAPH K8sSecurityGraph'
-"
+# 图结构只在 backend/schema.py 中声明，这里把它生成的 GSQL（建图 + 加载作业）交给 Pod 内的 gsql 执行
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+(cd "$SCRIPT_DIR/../backend" && python3 schema.py) > /tmp/k8s_security_schema.gsql || exit 1
+kubectl exec -i $POD_NAME -n tigergraph -- bash -c "cat > /tmp/k8s_security_schema.gsql && gsql /tmp/k8s_security_schema.gsql" < /tmp/k8s_security_schema.gsql
 
 echo "TigerGraph 初始化完成！"
\ No newline at end of file